@@ -0,0 +1,74 @@
+#Benchmark of the single pass BlockDispatcher against the separate passes the post-processors used to make over each page,
+#groupBlocksByType, extractKeyValuePairs and extractWords for forms, extractTableBlocks for tables and groupBlocksByType
+#again for text, checking along the way that tables, form fields and text are the same
+#
+#Usage: python benchmarks/bench_block_dispatch.py [--pages 200] [--form-fields 50] [--repeat 3]
+import io
+import os
+import sys
+import time
+import json
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+from synthetic import generatePage
+
+def extractSeparately(pages):
+    results = []
+    for page_blocks in pages:
+        blocks = textract_util.groupBlocksByType(page_blocks)
+        formKeys, formValues = textract_util.extractKeyValuePairs(blocks)
+        pageWords = textract_util.extractWords(blocks)
+        formEntries = textract_util.generateFormEntries(formKeys, formValues, pageWords)
+        tables = textract_util.extractTableBlocks(page_blocks)
+        text = list(textract_util.iterPageText(textract_util.groupBlocksByType(page_blocks)))
+        results.append((tables, formEntries, text))
+    return results
+
+def extractInOnePass(pages):
+    tableExtractor = textract_util.TableExtractor()
+    formExtractor = textract_util.FormExtractor()
+    textExtractor = textract_util.PageTextExtractor()
+    dispatcher = textract_util.BlockDispatcher([tableExtractor, formExtractor, textExtractor])
+    results = []
+    for page_blocks in pages:
+        dispatcher.reset()
+        dispatcher.dispatch(page_blocks)
+        results.append((tableExtractor.result(), formExtractor.result(), list(textExtractor.result())))
+    return results
+
+def timeit(function, repeat, argument):
+    best = None
+    for i in range(repeat):
+        #Both paths print a line per page, keep that out of the measurement output
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.time()
+            result = function(argument)
+            elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--form-fields', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = [generatePage(pageNumber, formFields=args.form_fields) for pageNumber in range(1, args.pages + 1)]
+    separateTime, expected = timeit(extractSeparately, args.repeat, pages)
+    dispatchTime, actual = timeit(extractInOnePass, args.repeat, pages)
+    for (expectedTables, expectedForm, expectedText), (tables, form, text) in zip(expected, actual):
+        assert json.dumps(tables) == json.dumps(expectedTables), "tables differ"
+        assert form == expectedForm, "form fields differ"
+        assert text == expectedText, "text differs"
+
+    print("{:>8} {:>10} {:>14} {:>14} {:>9}".format("pages", "blocks", "separate s", "dispatch s", "speedup"))
+    print("{:>8} {:>10} {:>14.3f} {:>14.3f} {:>8.1f}x".format(
+        len(pages), sum(map(len, pages)), separateTime, dispatchTime, separateTime / dispatchTime))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#Benchmark of the columnar block store against the blocks as parsed from the Textract JSON response
+#
+#Usage: python benchmarks/bench_block_store.py [--blocks 200000]
+#
+#Reports the size of each representation, and the time and peak traced memory of loading the response
+#and running textract_util.extractTableBlocks over it, from parsed JSON and from the memory mapped store.
+#Times are measured with tracing enabled, which slows both paths down.
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+from textract_blockstore import BlockStore, writeBlockStore
+from synthetic import generateDocumentOfSize
+
+def measure(function):
+    tracemalloc.start()
+    start = time.time()
+    result = function()
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blocks', type=int, default=200000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'blocks.txbs')
+    blocks = generateDocumentOfSize(args.blocks)
+    numBlocks = len(blocks)
+    jsonLines = [json.dumps(block, separators=(',', ':')) for block in blocks]
+    jsonSize = sum([len(line) for line in jsonLines])
+    start = time.time()
+    writeBlockStore(blocks, path)
+    writeTime = time.time() - start
+    del blocks
+
+    #Both measurements include loading the response, from JSON or from the mapped file
+    parsedTime, parsedPeak, parsedTables = measure(lambda: textract_util.extractTableBlocks([json.loads(line) for line in jsonLines]))
+    del jsonLines, parsedTables
+    storeTime, storePeak, storeTables = measure(lambda: textract_util.extractTableBlocks(BlockStore(path)))
+
+    print("Blocks: {}, Tables: {}".format(numBlocks, len(storeTables)))
+    print("Compact JSON size:  {:8.1f} MB".format(jsonSize / 1e6))
+    print("Block store size:   {:8.1f} MB, written in {:.2f}s".format(os.path.getsize(path) / 1e6, writeTime))
+    print("Load and extractTableBlocks from JSON:        {:6.2f}s, peak {:8.1f} MB".format(parsedTime, parsedPeak / 1e6))
+    print("Map and extractTableBlocks from block store:  {:6.2f}s, peak {:8.1f} MB".format(storeTime, storePeak / 1e6))
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#Benchmark of the import time each Lambda handler pays on a cold start, and of the clients it creates per invocation
+#Every figure is measured in a fresh interpreter, so that nothing is already imported
+#    before: the original textract_util, kept verbatim as baseline_textract_util, which every handler used to import as a whole
+#    after: only the textract modules the handler imports now
+#Modules boto3 imports anyway are imported beforehand, boto3 itself when installed, so that only the cost of the handler
+#modules is measured
+#When boto3 is installed, the time to create the clients of an invocation is also compared, new clients every time
+#against clients reused from the registry of textract_clients
+#
+#Usage: python benchmarks/bench_cold_start.py [--repeat 7]
+import os
+import sys
+import ast
+import glob
+import argparse
+import compileall
+import subprocess
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS = os.path.join(BENCHMARKS, '..', 'functions')
+
+#The textract_util of today re-exports every module split out of it, so the original module is timed instead
+#baseline_textract_util is also the reference the other benchmarks compare the current functions against
+BEFORE = "import baseline_textract_util"
+
+#Handlers that never imported textract_util, whose imports are unchanged
+UNCHANGED = ['textract-job-submit-async']
+
+#Standard modules boto3 and botocore import on their own, standing in for boto3 when it is not installed
+PRELOADED = "import json, logging, re, datetime, threading, concurrent.futures, xml.etree.ElementTree"
+
+#Clients created by each handler on every invocation before they were shared
+CLIENTS = {
+    'detect-text-postprocess-page': [('resource', 's3'), ('client', 'textract'), ('client', 'dynamodb')],
+    'detect-text-result-retrieval': [('resource', 's3'), ('client', 'textract'), ('resource', 'dynamodb')],
+    'document-analysis-fetch-result': [('resource', 's3'), ('client', 'sns'), ('client', 'textract'), ('client', 'dynamodb')],
+    'document-analysis-postprocess-form': [('resource', 's3'), ('client', 'textract'), ('client', 'dynamodb')],
+    'document-analysis-postprocess-table': [('resource', 's3'), ('client', 'textract'), ('client', 'dynamodb')],
+    'document-analysis-result-retrieval': [('client', 's3'), ('client', 'textract'), ('resource', 'dynamodb')],
+    'textract-job-submit-async': [('client', 's3'), ('client', 'textract'), ('client', 'dynamodb')]
+}
+
+#Function to list the textract modules a handler imports
+def handlerModules(path):
+    modules = []
+    for node in ast.walk(ast.parse(open(path).read())):
+        if isinstance(node, ast.ImportFrom) and node.module.startswith('textract_') and node.module != 'textract_clients':
+            modules.append(node.module)
+    return modules
+
+#Function to time a statement in a fresh interpreter, returns the median of several runs in milliseconds
+def timeInFreshInterpreter(setup, statement, repeat):
+    code = "import sys, time\nsys.path[:0] = [{!r}, {!r}]\n{}\nstarted = time.perf_counter()\n{}\nprint(time.perf_counter() - started)".format(FUNCTIONS, BENCHMARKS, setup, statement)
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    timings = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        timings.append(float(output.decode('utf-8').strip().splitlines()[-1]) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def hasBoto3():
+    return subprocess.call([sys.executable, '-c', 'import boto3'], stderr=subprocess.DEVNULL) == 0
+
+def createClients(clients, shared):
+    if shared:
+        calls = ["getClient({!r})".format(service) if kind == 'client' else "getResource({!r})".format(service) for kind, service in clients]
+        return "from textract_clients import getClient, getResource", "\n".join(calls * 2), "\n".join(calls)
+    calls = ["boto3.{}({!r})".format(kind, service) for kind, service in clients]
+    return "import boto3", "\n".join(calls), "\n".join(calls)
+
+#Function to time the clients of a second invocation, once those of the first one are created
+def timeClients(clients, shared, repeat):
+    setup, first, second = createClients(clients, shared)
+    return timeInFreshInterpreter(setup + "\n" + first, second, repeat)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+
+    #Byte code is compiled up front, as it is once deployed, so that no run pays for compiling a stale module
+    compileall.compile_dir(FUNCTIONS, quiet=1)
+    compileall.compile_dir(BENCHMARKS, quiet=1)
+    withBoto3 = hasBoto3()
+    preloaded = "import boto3" if withBoto3 else PRELOADED
+    before = timeInFreshInterpreter(preloaded, BEFORE, args.repeat)
+    print("{:>36} {:>10} {:>10} {:>14} {:>14}".format("handler", "before ms", "after ms", "new clients ms", "reused ms"))
+    for path in sorted(glob.glob(os.path.join(FUNCTIONS, '*-*.py'))):
+        handler = os.path.basename(path)[:-3]
+        modules = handlerModules(path)
+        after = timeInFreshInterpreter(preloaded, "import " + ", ".join(modules), args.repeat) if modules else 0.0
+        newClients = reusedClients = "n/a"
+        if withBoto3 and handler in CLIENTS:
+            newClients = "{:.2f}".format(timeClients(CLIENTS[handler], False, args.repeat))
+            reusedClients = "{:.2f}".format(timeClients(CLIENTS[handler], True, args.repeat))
+        print("{:>36} {:>10.2f} {:>10.2f} {:>14} {:>14}".format(handler, after if handler in UNCHANGED else before, after, newClients, reusedClients))
+    if not withBoto3:
+        print("boto3 is not installed, client creation was not measured")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#Benchmark of textract_util.generateFormEntries against the original implementation on a dense synthetic form,
+#checking along the way that both give the same fields, and that keys without a value no longer fail
+#
+#Usage: python benchmarks/bench_form_entries.py [--fields 10000] [--words-per-key 4] [--words-per-value 12] [--repeat 5]
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+import baseline_textract_util
+
+#Function to generate the keys, values and words of a form, as extractKeyValuePairs and extractWords return them
+def generateForm(numFields, wordsPerKey, wordsPerValue, numPages=10):
+    formKeys = {}
+    formValues = {}
+    pageWords = {}
+    for f in range(numFields):
+        keyWords = ['k{}-{}'.format(f, i) for i in range(wordsPerKey)]
+        valueWords = ['v{}-{}'.format(f, i) for i in range(wordsPerValue)]
+        for wordId in keyWords + valueWords:
+            pageWords[wordId] = {'Text': wordId.upper()}
+        page = f * numPages // numFields + 1
+        formKeys['key-{}'.format(f)] = {'CHILD': keyWords, 'VALUE': 'value-{}'.format(f), 'Page': page, 'Confidence': 90.0}
+        formValues['value-{}'.format(f)] = {'CHILD': valueWords, 'Page': page, 'Confidence': 85.0}
+    return formKeys, formValues, pageWords
+
+def timeit(function, repeat, *arguments):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(*arguments)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fields', type=int, default=10000)
+    parser.add_argument('--words-per-key', type=int, default=4)
+    parser.add_argument('--words-per-value', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    formKeys, formValues, pageWords = generateForm(args.fields, args.words_per_key, args.words_per_value)
+    legacyTime, expected = timeit(baseline_textract_util.generateFormEntries, args.repeat, formKeys, formValues, pageWords)
+    entriesTime, actual = timeit(textract_util.generateFormEntries, args.repeat, formKeys, formValues, pageWords)
+    fieldsTime, fields = timeit(textract_util.generateFormFields, args.repeat, formKeys, formValues, pageWords, True, True)
+    assert dict(actual) == dict(expected), "form entries differ"
+    assert [field['Page'] for field in fields] == sorted([field['Page'] for field in fields]), "fields out of page order"
+
+    #A key without a value used to fail the whole job
+    del formKeys['key-0']['VALUE']
+    assert textract_util.generateFormEntries(formKeys, formValues, pageWords)[textract_util.joinWordText(formKeys['key-0']['CHILD'], pageWords)] == [""]
+
+    print("{:>8} {:>12} {:>12} {:>12} {:>9}".format("fields", "legacy s", "entries s", "details s", "speedup"))
+    print("{:>8} {:>12.4f} {:>12.4f} {:>12.4f} {:>8.1f}x".format(args.fields, legacyTime, entriesTime, fieldsTime, legacyTime / entriesTime))
+
+if __name__ == "__main__":
+    main()
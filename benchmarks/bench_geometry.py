@@ -0,0 +1,86 @@
+#Benchmark of textract_geometry on a page holding thousands of words laid out over a large table,
+#assigning words to cells and sorting them in reading order, against a walk over the block dictionaries
+#Both the NumPy and the plain Python implementations are measured when NumPy is installed, checking that all agree
+#
+#Usage: python benchmarks/bench_geometry.py [--lines 100] [--words-per-line 60] [--rows 50] [--columns 10] [--repeat 3]
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_geometry
+from synthetic import generatePage
+
+#Function to assign each word to the cell covering most of its area by walking the block dictionaries, as a reference
+def assignByDictWalk(words, cells, minOverlap=0.5):
+    assigned = []
+    for word in words:
+        box = word['Geometry']['BoundingBox']
+        best = -1
+        bestOverlap = 0.0
+        for c, cell in enumerate(cells):
+            cellBox = cell['Geometry']['BoundingBox']
+            width = min(box['Left'] + box['Width'], cellBox['Left'] + cellBox['Width']) - max(box['Left'], cellBox['Left'])
+            height = min(box['Top'] + box['Height'], cellBox['Top'] + cellBox['Height']) - max(box['Top'], cellBox['Top'])
+            if width > 0 and height > 0 and width * height > bestOverlap:
+                best = c
+                bestOverlap = width * height
+        if best >= 0 and bestOverlap < minOverlap * (1 - textract_geometry.OVERLAP_TOLERANCE) * box['Width'] * box['Height']:
+            best = -1
+        assigned.append(best)
+    return assigned
+
+def assignWithArrays(words, cells, vectorized):
+    wordBoxes = textract_geometry.boxArray([word['Geometry']['BoundingBox'] for word in words], vectorized)
+    cellBoxes = textract_geometry.boxArray([cell['Geometry']['BoundingBox'] for cell in cells], vectorized)
+    return textract_geometry.assignBoxes(wordBoxes, cellBoxes)
+
+def orderWithArrays(words, vectorized):
+    return textract_geometry.readingOrder(textract_geometry.boxArray([word['Geometry']['BoundingBox'] for word in words], vectorized))
+
+def timeit(function, repeat, *arguments):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(*arguments)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=100)
+    parser.add_argument('--words-per-line', type=int, default=60)
+    parser.add_argument('--rows', type=int, default=50)
+    parser.add_argument('--columns', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    blocks = generatePage(1, linesPerPage=args.lines, wordsPerLine=args.words_per_line, tableRows=args.rows, tableColumns=args.columns)
+    words = [block for block in blocks if block['BlockType'] == 'WORD']
+    cells = [block for block in blocks if block['BlockType'] == 'CELL']
+    random.seed(1)
+    shuffled = random.sample(words, len(words))
+    backends = [False, True] if textract_geometry.HAS_NUMPY else [False]
+
+    print("{} words, {} cells, NumPy {}".format(len(words), len(cells), "available" if textract_geometry.HAS_NUMPY else "not installed"))
+    print("{:>24} {:>12}".format("", "seconds"))
+    walkTime, expected = timeit(assignByDictWalk, args.repeat, words, cells)
+    print("{:>24} {:>12.4f}".format("assign, dict walk", walkTime))
+    for vectorized in backends:
+        arrayTime, assigned = timeit(assignWithArrays, args.repeat, words, cells, vectorized)
+        assert assigned == expected, "word assignment differs"
+        print("{:>24} {:>12.4f} {:>8.1f}x".format("assign, " + ("numpy" if vectorized else "python"), arrayTime, walkTime / arrayTime))
+
+    orders = []
+    for vectorized in backends:
+        orderTime, order = timeit(orderWithArrays, args.repeat, shuffled, vectorized)
+        orders.append([shuffled[i]['Id'] for i in order])
+        print("{:>24} {:>12.4f}".format("reading order, " + ("numpy" if vectorized else "python"), orderTime))
+    assert all([order == [word['Id'] for word in words] for order in orders]), "reading order differs from the page layout"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#Benchmark of prefetched result retrieval, overlapping the Textract round trip of the next
+#page of results with the processing of the current one
+#
+#Usage: python benchmarks/bench_prefetch.py [--pages 300] [--latency 0.003] [--depths 0,1,2,4]
+#
+#Textract is simulated by a client that waits --latency seconds per call, and processing
+#extracts the tables of each document page from a synthetic response.
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+from synthetic import generateDocument
+
+class SimulatedTextract:
+
+    def __init__(self, blocks, latency):
+        self.blocks = blocks
+        self.latency = latency
+
+    def get_document_analysis(self, JobId, MaxResults, NextToken=None):
+        time.sleep(self.latency)
+        start = int(NextToken) if NextToken is not None else 0
+        response = {'DocumentMetadata': {'Pages': self.blocks[-1]['Page']}, 'Blocks': self.blocks[start:start + MaxResults]}
+        if start + MaxResults < len(self.blocks):
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+def process(textract, prefetchDepth):
+    numTables = 0
+    responses = textract_util.iterDocumentAnalysisResult(textract, 'job', prefetchDepth)
+    for pageNumber, pageBlocks in textract_util.iterBlocksByPage(textract_util.iterResultBlocks(responses)):
+        numTables += len(textract_util.extractTableBlocks(pageBlocks))
+    return numTables
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.003)
+    parser.add_argument('--depths', default='0,1,2,4')
+    args = parser.parse_args()
+
+    os.environ.setdefault('max_results', '1000')
+    os.environ.setdefault('retry_interval', '1')
+    os.environ.setdefault('max_retry_attempt', '3')
+    textract = SimulatedTextract(generateDocument(args.pages), args.latency)
+    numCalls = (len(textract.blocks) + 999) // 1000
+    print("Pages: {}, Blocks: {}, Textract calls: {}, Simulated download: {:.2f}s".format(
+        args.pages, len(textract.blocks), numCalls, numCalls * args.latency))
+
+    for depth in [int(depth) for depth in args.depths.split(',')]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.time()
+            numTables = process(textract, depth)
+            elapsed = time.time() - start
+        print("Prefetch depth {}: {:.2f}s ({} tables)".format(depth, elapsed, numTables))
+
+if __name__ == '__main__':
+    main()
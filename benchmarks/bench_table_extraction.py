@@ -0,0 +1,54 @@
+#Benchmark of textract_util.extractTableBlocks against the original quadratic implementation
+#
+#Usage: python benchmarks/bench_table_extraction.py [--sizes 10000,100000,1000000] [--legacy-limit 20000]
+#
+#The original implementation is only timed up to --legacy-limit blocks, beyond that its
+#quadratic running time is extrapolated from the largest measured size.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+import baseline_textract_util
+from synthetic import generateDocumentOfSize
+
+def timeit(function, argument):
+    start = time.time()
+    result = function(argument)
+    return time.time() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--legacy-limit', type=int, default=20000)
+    args = parser.parse_args()
+
+    print("{:>10} {:>8} {:>8} {:>12} {:>12} {:>10}".format("Blocks", "Tables", "Cells", "Legacy (s)", "Indexed (s)", "Speedup"))
+    legacyRate = None
+    for size in [int(size) for size in args.sizes.split(',')]:
+        blocks = generateDocumentOfSize(size)
+        indexedTime, tables = timeit(textract_util.extractTableBlocks, blocks)
+        numCells = sum([len(table['Cells']) for table in tables.values()])
+
+        if len(blocks) <= args.legacy_limit:
+            legacyTime, legacyTables = timeit(baseline_textract_util.extractTableBlocks, blocks)
+            for tableId in legacyTables:
+                assert legacyTables[tableId]['Grid'] == tables[tableId]['Grid']
+                assert legacyTables[tableId]['ContainingPage'] == tables[tableId]['ContainingPage']
+            legacyRate = legacyTime / (float(len(blocks)) ** 2)
+            legacyLabel = "{:.3f}".format(legacyTime)
+        elif legacyRate is not None:
+            legacyTime = legacyRate * float(len(blocks)) ** 2
+            legacyLabel = "~{:.0f}".format(legacyTime)
+        else:
+            legacyTime = None
+            legacyLabel = "skipped"
+
+        speedup = "{:.0f}x".format(legacyTime / indexedTime) if legacyTime else "-"
+        print("{:>10} {:>8} {:>8} {:>12} {:>12.3f} {:>10}".format(len(blocks), len(tables), numCells, legacyLabel, indexedTime, speedup))
+
+if __name__ == '__main__':
+    main()
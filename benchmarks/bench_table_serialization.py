@@ -0,0 +1,60 @@
+#Benchmark of textract_util.writeTableHTML against prettify on the elements from generateTableXML,
+#checking along the way that the indented output is byte for byte the same
+#
+#Usage: python benchmarks/bench_table_serialization.py [--repeat 5]
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+
+#Cell texts mixing plain words, characters that need escaping and empty cells
+TEXTS = ['Total', 'Q3 & Q4', '<none>', 'say "yes"', "it's", '1 > 0', '12,345.67', '', None]
+
+def generateTables(numTables, numRows, numColumns, seed=1):
+    random.seed(seed)
+    tabledict = {}
+    for t in range(numTables):
+        grid = [[random.choice(TEXTS) for j in range(numColumns)] for i in range(numRows)]
+        tabledict['table-{}'.format(t)] = {'ContainingPage': t // 2 + 1, 'NumRows': numRows, 'NumColumns': numColumns, 'Grid': grid}
+    return tabledict
+
+def serializeWithPrettify(tabledict):
+    num_tables, tables = textract_util.generateTableXML(tabledict)
+    return [textract_util.prettify(table) for page in tables for table in page]
+
+def serializeWithWriter(tabledict, compact=False):
+    num_tables, tables = textract_util.numberTables(tabledict)
+    return [textract_util.writeTableHTML(tkey, tabledict[tkey], tableNumber, compact) for page in tables for tkey, tableNumber in page]
+
+def timeit(function, repeat, *arguments):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(*arguments)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:>10} {:>7} {:>12} {:>12} {:>12} {:>9}".format("table", "tables", "prettify s", "writer s", "compact s", "speedup"))
+    for numRows, numColumns, numTables in [(10, 10, 200), (500, 50, 2)]:
+        tabledict = generateTables(numTables, numRows, numColumns)
+        prettifyTime, expected = timeit(serializeWithPrettify, args.repeat, tabledict)
+        writerTime, actual = timeit(serializeWithWriter, args.repeat, tabledict)
+        compactTime, compact = timeit(serializeWithWriter, args.repeat, tabledict, True)
+        assert actual == expected, "writeTableHTML output differs from prettify"
+        print("{:>10} {:>7} {:>12.4f} {:>12.4f} {:>12.4f} {:>8.1f}x".format(
+            "{}x{}".format(numRows, numColumns), numTables, prettifyTime, writerTime, compactTime, prettifyTime / writerTime))
+        print("{:>10} {:>7} {:>12} {:>12} {:>12}".format("", "bytes", sum(map(len, expected)), sum(map(len, actual)), sum(map(len, compact))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#Regression benchmark of textract_util.extractTextBody against the original implementation,
+#which scanned every LINE block for each line of each page
+#
+#Usage: python benchmarks/bench_text_extraction.py [--pages 1000] [--lines-per-page 20]
+import io
+import os
+import sys
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions'))
+
+import textract_util
+import baseline_textract_util
+from synthetic import generateDocument
+
+def timeit(function, argument):
+    #Both implementations print a line per page, keep that out of the measurement output
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.time()
+        result = function(argument)
+        elapsed = time.time() - start
+    return elapsed, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=1000)
+    parser.add_argument('--lines-per-page', type=int, default=20)
+    parser.add_argument('--words-per-line', type=int, default=8)
+    args = parser.parse_args()
+
+    blocks = generateDocument(args.pages, linesPerPage=args.lines_per_page,
+                              wordsPerLine=args.words_per_line, tablesPerPage=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        grouped = textract_util.groupBlocksByType(blocks)
+
+    legacyTime, legacyResult = timeit(baseline_textract_util.extractTextBody, grouped)
+    currentTime, currentResult = timeit(textract_util.extractTextBody, grouped)
+    assert legacyResult == currentResult, "extractTextBody output differs from the original implementation"
+
+    print("Pages: {}, Lines: {}, Blocks: {}".format(args.pages, currentResult[1], len(blocks)))
+    print("Original extractTextBody: {:.3f}s".format(legacyTime))
+    print("Current extractTextBody:  {:.3f}s".format(currentTime))
+    print("Speedup: {:.0f}x".format(legacyTime / currentTime))
+
+if __name__ == '__main__':
+    main()
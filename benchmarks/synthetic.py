@@ -0,0 +1,95 @@
+import uuid
+
+_geometryCache = {}
+
+#Function to generate a bounding box and polygon for a block placed at the given position
+#Geometry is shared between blocks at the same position, so that million block documents fit in memory
+def geometry(left, top, width, height):
+    key = (left, top, width, height)
+    if key not in _geometryCache:
+        _geometryCache[key] = _newGeometry(left, top, width, height)
+    return _geometryCache[key]
+
+def _newGeometry(left, top, width, height):
+    return {
+        'BoundingBox': {'Width': width, 'Height': height, 'Left': left, 'Top': top},
+        'Polygon': [
+            {'X': left, 'Y': top},
+            {'X': left + width, 'Y': top},
+            {'X': left + width, 'Y': top + height},
+            {'X': left, 'Y': top + height}
+        ]
+    }
+
+def newId():
+    return str(uuid.uuid4())
+
+#Function to generate the blocks of one synthetic page, in the order Textract returns them
+def generatePage(pageNumber, linesPerPage=40, wordsPerLine=8, tablesPerPage=1, tableRows=10, tableColumns=5, formFields=0):
+    page = {'BlockType': 'PAGE', 'Id': newId(), 'Page': pageNumber,
+            'Geometry': geometry(0.0, 0.0, 1.0, 1.0), 'Relationships': [{'Type': 'CHILD', 'Ids': []}]}
+    pageChildren = page['Relationships'][0]['Ids']
+    blocks = [page]
+    lineHeight = 1.0 / max(linesPerPage, 1)
+    wordWidth = 1.0 / max(wordsPerLine, 1)
+
+    for i in range(linesPerPage):
+        words = []
+        for j in range(wordsPerLine):
+            words.append({'BlockType': 'WORD', 'Id': newId(), 'Page': pageNumber, 'Confidence': 99.0,
+                          'Text': 'w{}-{}'.format(i, j), 'TextType': 'PRINTED',
+                          'Geometry': geometry(j * wordWidth, i * lineHeight, wordWidth * 0.9, lineHeight * 0.8)})
+        line = {'BlockType': 'LINE', 'Id': newId(), 'Page': pageNumber, 'Confidence': 99.0,
+                'Text': ' '.join([word['Text'] for word in words]),
+                'Geometry': geometry(0.0, i * lineHeight, 1.0, lineHeight * 0.8),
+                'Relationships': [{'Type': 'CHILD', 'Ids': [word['Id'] for word in words]}]}
+        pageChildren.append(line['Id'])
+        blocks.append(line)
+        blocks.extend(words)
+
+    #Words of the first lines double as cell and form contents, as they do in real responses
+    wordIds = [block['Id'] for block in blocks if block['BlockType'] == 'WORD']
+
+    for t in range(tablesPerPage):
+        table = {'BlockType': 'TABLE', 'Id': newId(), 'Page': pageNumber, 'Confidence': 99.0,
+                 'Geometry': geometry(0.0, 0.5, 1.0, 0.5), 'Relationships': [{'Type': 'CHILD', 'Ids': []}]}
+        pageChildren.append(table['Id'])
+        blocks.append(table)
+        for r in range(tableRows):
+            for c in range(tableColumns):
+                cellWords = [wordIds[(r * tableColumns + c) % len(wordIds)]] if wordIds else []
+                cell = {'BlockType': 'CELL', 'Id': newId(), 'Page': pageNumber, 'Confidence': 95.0,
+                        'RowIndex': r + 1, 'ColumnIndex': c + 1, 'RowSpan': 1, 'ColumnSpan': 1,
+                        'Geometry': geometry(c / tableColumns, 0.5 + r * 0.5 / tableRows, 1.0 / tableColumns, 0.5 / tableRows),
+                        'Relationships': [{'Type': 'CHILD', 'Ids': cellWords}]}
+                table['Relationships'][0]['Ids'].append(cell['Id'])
+                blocks.append(cell)
+
+    for f in range(formFields):
+        valueWords = [wordIds[(2 * f + 1) % len(wordIds)]] if wordIds else []
+        keyWords = [wordIds[(2 * f) % len(wordIds)]] if wordIds else []
+        value = {'BlockType': 'KEY_VALUE_SET', 'Id': newId(), 'Page': pageNumber, 'Confidence': 90.0,
+                 'EntityTypes': ['VALUE'], 'Geometry': geometry(0.5, f / max(formFields, 1), 0.4, 0.01),
+                 'Relationships': [{'Type': 'CHILD', 'Ids': valueWords}]}
+        key = {'BlockType': 'KEY_VALUE_SET', 'Id': newId(), 'Page': pageNumber, 'Confidence': 90.0,
+               'EntityTypes': ['KEY'], 'Geometry': geometry(0.0, f / max(formFields, 1), 0.4, 0.01),
+               'Relationships': [{'Type': 'VALUE', 'Ids': [value['Id']]}, {'Type': 'CHILD', 'Ids': keyWords}]}
+        pageChildren.append(key['Id'])
+        pageChildren.append(value['Id'])
+        blocks.append(key)
+        blocks.append(value)
+
+    return blocks
+
+#Function to generate a synthetic multi-page response as one flat list of blocks
+def generateDocument(numPages, **pageOptions):
+    blocks = []
+    for pageNumber in range(1, numPages + 1):
+        blocks.extend(generatePage(pageNumber, **pageOptions))
+    return blocks
+
+#Function to generate a synthetic response holding approximately the given number of blocks
+def generateDocumentOfSize(numBlocks, **pageOptions):
+    blocksPerPage = len(generatePage(1, **pageOptions))
+    numPages = max(1, int(round(float(numBlocks) / blocksPerPage)))
+    return generateDocument(numPages, **pageOptions)
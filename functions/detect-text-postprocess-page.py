@@ -1,17 +1,24 @@
-from textract_util import *
+from textract_results import iterTextDetectionResult, iterResultBlocks, iterBlocksByPage
+from textract_blocks import BlockDispatcher
+from textract_text import PageTextExtractor
+from textract_spatial import SpatialIndexExtractor, getSpatialIndexSettings
+from textract_output import getOutputSink, PageChunkWriter, JsonObjectWriter, recordJobFiles
+from textract_clients import getClient, getResource
+from textract_ratelimit import releaseOpenJob
 import io
 import os
 import json
 import time
-import boto3
 
 def lambda_handler(event, context):
     
     #Initialize Boto Resource	
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.client('dynamodb')
+    s3 = getResource('s3')
+    textract = getClient('textract')
+    dynamodb = getClient('dynamodb')
     table_name=os.environ['table_name']
+    pages_per_chunk = int(os.environ['pages_per_chunk']) if 'pages_per_chunk' in os.environ else 0
+    spatial_index = os.environ['spatial_index'] if 'spatial_index' in os.environ else "none"
     file_list = []
 
     if "Records" in event:        
@@ -20,7 +27,9 @@ def lambda_handler(event, context):
 
         print("{} messages recieved".format(numRecords))
         for record in records:
-            documentBlocks = None
+            documentPages = None
+            documentMetadata = {}
+            num_blocks = 0
             num_pages = 0     
             num_lines = 0
             bucket = ""
@@ -64,40 +73,73 @@ def lambda_handler(event, context):
 
                     print("upload_prefix = " + upload_prefix)  
 
-                    num_pages, documentBlocks = GetTextDetectionResult(textract, textractJobId) 
+                    #The job is no longer open once Textract reports its completion
+                    releaseOpenJob(textractJobId, 'TextDetection', dynamodb, table_name)
 
-            if documentBlocks is not None and len(documentBlocks) > 0:
-                print("{} Blocks retrieved".format(len(documentBlocks)))
-        
-                #Extract lines of texts into a Python dictionary by parsing the raw JSON from Textract
-                blocks = groupBlocksByType(documentBlocks)
-                document_text, num_lines = extractTextBody(blocks)
+                    documentPages = iterBlocksByPage(iterResultBlocks(iterTextDetectionResult(textract, textractJobId), documentMetadata))
 
-        
-                #Generate JSON document using form fields information          
-                json_document = "{}-text.json".format(document_name)
-                json_file = open("/tmp/"+json_document,'w+')
-                json_file.write(json.dumps(document_text, indent=4, sort_keys=True))
-                json_file.close()
-                s3.meta.client.upload_file("/tmp/"+json_document, bucket, "{}/{}".format(upload_prefix,json_document))         
+            #Process the result one document page at a time, as the pages of results arrive from Textract
+            textWriter = None
+            chunkWriter = None
+            #Lines of text are extracted from each page in a single pass over its blocks
+            textExtractor = PageTextExtractor()
+            dispatcher = BlockDispatcher([textExtractor])
+            spatialExtractor = None
+            spatialWriter = None
+            if documentPages is not None:
+                #Leaving the sink waits for every output to be uploaded before they are recorded, and releases its uploads
+                #when the extraction fails
+                with getOutputSink(s3.meta.client, bucket) as sink:
+                    if pages_per_chunk > 0:
+                        chunkWriter = PageChunkWriter(sink, upload_prefix, document_name, "text", pages_per_chunk)
 
-                try:
-                    response = dynamodb.update_item(
-                        TableName=table_name,
-                        Key={
-                            'JobId':{'S':textractJobId},
-                            'JobType':{'S':'TextDetection'}
-                        },
-                        ExpressionAttributeNames={"#tf": "TextFiles", "#jst": "JobStatus", "#jct": "JobCompleteTimeStamp", "#nl": "NumLines", "#np": "NumPages"},
-                        UpdateExpression='SET #tf = list_append(#tf, :text_files), #jst = :job_status, #jct = :job_complete, #nl = :num_lines, #np = :num_pages',
-                        ExpressionAttributeValues={
-                            ":text_files": {"L": [{"S": "{}/{}".format(upload_prefix,json_document)}]},
-                            ":job_status": {"S": textractStatus},
-                            ":job_complete": {"N": str(textractTimestamp)},
-                            ":num_lines": {"N": str(num_lines)},
-                            ":num_pages": {"N": str(num_pages)}
+                    #The spatial index of each page is built in the same pass, from the bounding boxes of its words and lines
+                    if spatial_index == "grid":
+                        spatial_types, spatial_grid_size, spatial_pages_per_chunk = getSpatialIndexSettings()
+                        spatialExtractor = dispatcher.register(SpatialIndexExtractor(spatial_types, spatial_grid_size))
+                        spatialWriter = PageChunkWriter(sink, upload_prefix, document_name, "spatial", spatial_pages_per_chunk, sortKeys=False)
+                    for page_number, page_blocks in documentPages:
+                        num_blocks += len(page_blocks)
+                        #The text of the document is written one page at a time, rather than held until the last page
+                        if textWriter is None:
+                            json_document = "{}-text.json".format(document_name)
+                            textWriter = JsonObjectWriter(sink.open("{}/{}".format(upload_prefix,json_document)))
+
+                        #Extract lines of texts into a Python dictionary by parsing the raw JSON from Textract
+                        dispatcher.reset()
+                        dispatcher.dispatch(page_blocks)
+                        dispatcher.printCounts()
+                        for page_key, page_text in textExtractor.result():
+                            textWriter.add(page_key, page_text)
+                            num_lines += len(page_text)
+                            if chunkWriter is not None:
+                                chunkWriter.add(page_number, page_text)
+                        if spatialExtractor is not None:
+                            spatialWriter.add(page_number, spatialExtractor.result())
+                    num_pages = documentMetadata['Pages'] if 'Pages' in documentMetadata else 0
+
+                    if num_blocks > 0:
+                        textWriter.close()
+
+                        #Chunks of pages, along with their index, let retrieval read a range of pages only
+                        attributes = {
+                            "JobStatus": {"S": textractStatus},
+                            "JobCompleteTimeStamp": {"N": str(textractTimestamp)},
+                            "NumLines": {"N": str(num_lines)},
+                            "NumPages": {"N": str(num_pages)}
                         }
-                    )
+                        if chunkWriter is not None:
+                            attributes["TextIndex"] = {"S": chunkWriter.close()}
+                        if spatialWriter is not None:
+                            attributes["SpatialIndex"] = {"S": spatialWriter.close()}
+
+            if num_blocks > 0:
+                print("{} Blocks retrieved".format(num_blocks))
+                print("{} Lines extracted".format(num_lines))
+
+                #The text files are set rather than appended, so that SNS redeliveries simply repeat the update
+                try:
+                    recordJobFiles(dynamodb, table_name, textractJobId, 'TextDetection', 'TextFiles', ["{}/{}".format(upload_prefix,json_document)], attributes)
                 except Exception as e:
                     print('DynamoDB Insertion Error is: {0}'.format(e))                            
             else:
@@ -2,21 +2,64 @@ import io
 import os
 import json
 import time
-import boto3
 from datetime import datetime
-from xml.etree import ElementTree
-from textract_util import *
+from textract_retrieval import findLatestJob, getMaxConcurrentReads, fetchObjects, summarizeFetchTimings, selectPages, fetchPageRange
+from textract_clients import getClient, getResource
+from textract_cache import getResultCache, getResultVersion, getResultETag, matchesETag
+from textract_spatial import selectRegion, queryPageIndex
+
+#Client shared by all invocations of the container, with a connection pool large enough for all concurrent reads
+s3client = getClient('s3', getMaxConcurrentReads())
+
+#Function to read the spatial index of a page of a job, from the chunk of indexes holding it
+def fetchPageIndex(s3client, item, pageNumber):
+    pages, timings = fetchPageRange(s3client, item['DocumentBucket'], item['SpatialIndex'], pageNumber, pageNumber)
+    numBytes = sum([timing['Bytes'] for timing in timings])
+    return (pages[0][1] if len(pages) > 0 else None), numBytes
+
+#Function to answer a region query of a job, from the spatial index of the page of the region
+#The index of the page is cached, so that further queries on the same page are answered without reading it again
+def queryRegion(s3client, item, region, ifNoneMatch, jsonresponse):
+    if 'SpatialIndex' not in item:
+        jsonresponse["Error"] = "Spatial index not available for job {}".format(item['JobId'])
+        return jsonresponse
+    resultFiles = [item['SpatialIndex']]
+    etag = getResultETag(item['JobId'], item['JobCompleteTimeStamp'], resultFiles, "REGION:" + json.dumps(region, sort_keys=True))
+    if matchesETag(ifNoneMatch, etag):
+        print("Result {} of job {} not modified".format(etag, item['JobId']))
+        return {'JobId': item['JobId'], 'JobStatus': jsonresponse['JobStatus'], 'ETag': etag, 'NotModified': True, 'Region': region}
+
+    cache = getResultCache()
+    cacheKey = (item['JobId'], "SPATIAL:{}".format(region['Page']))
+    version = getResultVersion(s3client, item['DocumentBucket'], item, resultFiles)
+    pageIndex = cache.get(cacheKey, version) if version is not None else None
+    if pageIndex is not None:
+        print("Result cache hit for the spatial index of page {} of job {}".format(region['Page'], item['JobId']))
+    else:
+        pageIndex, numBytes = fetchPageIndex(s3client, item, region['Page'])
+        if version is not None and pageIndex is not None:
+            cache.put(cacheKey, version, pageIndex, numBytes)
+    print("Result cache: {}".format(json.dumps(cache.stats())))
+
+    blocks = []
+    if pageIndex is not None:
+        blocks = queryPageIndex(pageIndex, region['Left'], region['Top'], region['Width'], region['Height'],
+                                region.get('BlockType'), region.get('MinOverlap', 0.5))
+    jsonresponse['Region'] = region
+    jsonresponse['Blocks'] = blocks
+    jsonresponse['ETag'] = etag
+    return jsonresponse
 
 def lambda_handler(event, context):    
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.resource('dynamodb')
+    dynamodb = getResource('dynamodb')
     table_name=os.environ['table_name']
     table = dynamodb.Table(table_name)    
    
     documentBucket = event['DocumentBucket']
     documentKey = event['DocumentKey']
 
+    ifNoneMatch = event['IfNoneMatch'] if 'IfNoneMatch' in event else None
+
     print("Invoking retrieval function for text detection result")
 
     jsonresponse = {}
@@ -26,19 +69,7 @@ def lambda_handler(event, context):
     jobCompleteTimeStamp = None  
 
     try:
-        response = table.scan(
-            FilterExpression = "DocumentBucket = :bucket and DocumentKey = :key and JobType =:jobType",
-            ExpressionAttributeValues = {
-                ":bucket": documentBucket,
-                ":key": documentKey,
-                ":jobType": 'TextDetection'
-
-            }
-        )
-        recordsMatched = len(response['Items'])
-        print("{} matching records found for {}/{}".format(recordsMatched, documentBucket, documentKey))
-        if recordsMatched > 0:
-            item = response['Items'][-1]
+        item = findLatestJob(table, documentBucket, documentKey, 'TextDetection')
     except Exception as e:
         print('Actual error is: {0}'.format(e))
 
@@ -64,19 +95,67 @@ def lambda_handler(event, context):
     
         textFiles = item['TextFiles']
         print("Document Text stored in {} files".format(len(textFiles)))
-        for textFile in textFiles:
-            s3_object = s3.Object(documentBucket,textFile)
-            print("Reading Document text from {}".format(textFile))
-            s3_response = s3_object.get()
-            jsonstring = s3_response['Body'].read()
-
-            documentjson = json.loads(jsonstring)
-
-            jsonresponse = {}
-            for page in documentjson.keys():
-                jsonresponse[page] = []
-                for line in documentjson[page].keys():
-                    jsonresponse[page].append(documentjson[page][line]['Text'])
+        try:
+            selection = selectPages(event, item['JobId'], int(item['NumPages']))
+            region = selectRegion(event, int(item['NumPages']))
+        except ValueError as e:
+            jsonresponse["Error"] = str(e)
+            return jsonresponse
+        if region is not None:
+            #Region queries return the words and lines within a region of a page, read from the spatial index of the page
+            return queryRegion(s3client, item, region, ifNoneMatch, jsonresponse)
+        variant = "TEXT"
+        resultFiles = textFiles
+        if selection is not None:
+            variant = "TEXT:{}-{}".format(selection['FirstPage'], selection['LastPage'])
+            if 'TextIndex' in item:
+                resultFiles = [item['TextIndex']]
 
+        etag = getResultETag(item['JobId'], jobCompleteTimeStamp, resultFiles, variant)
+        if matchesETag(ifNoneMatch, etag):
+            #The caller already holds this result, only the job status is returned
+            print("Result {} of job {} not modified".format(etag, item['JobId']))
+            jsonresponse = {'JobId': item['JobId'], 'JobStatus': jsonresponse['JobStatus'], 'ETag': etag, 'NotModified': True}
+            if selection is not None:
+                jsonresponse.update(selection)
+            return jsonresponse
+        cache = getResultCache()
+        cacheKey = (item['JobId'], variant)
+        version = getResultVersion(s3client, documentBucket, item, resultFiles)
+        result = cache.get(cacheKey, version) if version is not None else None
+        if result is not None:
+            print("Result cache hit for text of job {}".format(item['JobId']))
+        elif selection is not None and 'TextIndex' in item:
+            #Only the chunks holding the selected pages are read
+            pages, timings = fetchPageRange(s3client, documentBucket, item['TextIndex'], selection['FirstPage'], selection['LastPage'])
+            result = {}
+            for pageNumber, pageText in pages:
+                result['Page-{0:02d}'.format(pageNumber)] = [pageText[line]['Text'] for line in sorted(pageText.keys())]
+            if version is not None:
+                cache.put(cacheKey, version, result, sum([timing['Bytes'] for timing in timings]))
+        else:
+            result = None
+            fetchStarted = time.time()
+            print("Reading Document text from {}".format(", ".join(textFiles)))
+            textResults = fetchObjects(s3client, documentBucket, textFiles, json.loads)
+            textTimings = [textTiming for documentjson, textTiming in textResults]
+            print("Text files read: {}".format(json.dumps(summarizeFetchTimings(textTimings, time.time() - fetchStarted))))
+            numBytes = sum([textTiming['Bytes'] for textTiming in textTimings])
+            for documentjson, textTiming in textResults:
+                result = {}
+                for page in documentjson.keys():
+                    if selection is not None and not selection['FirstPage'] <= int(page[len('Page-'):]) <= selection['LastPage']:
+                        continue
+                    result[page] = []
+                    for line in documentjson[page].keys():
+                        result[page].append(documentjson[page][line]['Text'])
+            if version is not None and result is not None:
+                cache.put(cacheKey, version, result, numBytes)
+        if result is not None:
+            jsonresponse = dict(result)
+        print("Result cache: {}".format(json.dumps(cache.stats())))
+        jsonresponse['ETag'] = etag
+        if selection is not None:
+            jsonresponse.update(selection)
 
     return jsonresponse
\ No newline at end of file
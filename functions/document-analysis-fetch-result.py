@@ -0,0 +1,76 @@
+from textract_results import iterDocumentAnalysisResult, iterResultBlocks, writeStoredBlocks
+from textract_clients import getClient, getResource
+from textract_ratelimit import releaseOpenJob
+import io
+import os
+import json
+import time
+
+def lambda_handler(event, context):
+    
+    #Initialize Boto Resource	
+    s3 = getResource('s3')
+    sns = getClient('sns')
+    textract = getClient('textract')
+    dynamodb = getClient('dynamodb')
+    table_name = os.environ['table_name']
+    result_topic_arn = os.environ['result_topic_arn']
+    blocks_format = os.environ['blocks_format'] if 'blocks_format' in os.environ else "jsonl"
+    blocks_files = []
+
+    if "Records" in event:        
+        records = event['Records']
+        numRecords = len(records)
+
+        print("{} messages recieved".format(numRecords))
+        for record in records:
+            if 'Sns' in record.keys() and 'Message' in record['Sns'].keys():
+                message = json.loads(record['Sns']['Message'])
+                textractJobId = message['JobId']
+                print("{} = {}".format("JobId", textractJobId))
+                print("{} = {}".format("Status", message['Status']))
+                documentLocation = message['DocumentLocation']
+                textractS3ObjectName = documentLocation['S3ObjectName']
+                print("{} = {}".format("S3ObjectName", textractS3ObjectName))    
+                textractS3Bucket = documentLocation['S3Bucket']
+                print("{} = {}".format("S3Bucket", textractS3Bucket))      
+
+                bucket = textractS3Bucket
+                document_path = textractS3ObjectName[:textractS3ObjectName.rfind("/")] if textractS3ObjectName.find("/") >= 0 else ""
+                document_name = textractS3ObjectName[textractS3ObjectName.rfind("/")+1:textractS3ObjectName.rfind(".")] if textractS3ObjectName.find("/") >= 0 else textractS3ObjectName[:textractS3ObjectName.rfind(".")]
+
+                if document_path == "":
+                    upload_prefix = textractJobId
+                else:
+                    upload_prefix = "{}/{}".format(document_path, textractJobId)
+
+                print("upload_prefix = " + upload_prefix)  
+
+                #The job is no longer open once Textract reports its completion
+                releaseOpenJob(textractJobId, 'DocumentAnalysis', dynamodb, table_name)
+
+                #Retrieve the analysis result once, and store the raw blocks for all post processing functions
+                documentMetadata = {}
+                resultBlocks = iterResultBlocks(iterDocumentAnalysisResult(textract, textractJobId), documentMetadata)
+                if blocks_format == "blockstore":
+                    #The block store is only imported by functions configured to write it
+                    from textract_blockstore import writeBlockStore
+                    blocks_document = "{}-blocks.txbs".format(document_name)
+                    num_blocks = writeBlockStore(resultBlocks, "/tmp/"+blocks_document)
+                else:
+                    blocks_document = "{}-blocks.jsonl.gz".format(document_name)
+                    num_blocks = writeStoredBlocks(resultBlocks, "/tmp/"+blocks_document)
+                print("{} Blocks retrieved".format(num_blocks))
+                s3.meta.client.upload_file("/tmp/"+blocks_document, bucket, "{}/{}".format(upload_prefix,blocks_document))
+                os.remove("/tmp/"+blocks_document)
+
+                #Forward the job completion message, along with the location of the stored blocks
+                message['BlocksLocation'] = {'S3Bucket': bucket, 'S3ObjectName': "{}/{}".format(upload_prefix,blocks_document)}
+                message['NumBlocks'] = num_blocks
+                message['DocumentMetadata'] = documentMetadata
+                sns.publish(TopicArn=result_topic_arn, Message=json.dumps(message))
+                blocks_files.append("https://s3.amazonaws.com/{}/{}/{}".format(bucket, upload_prefix, blocks_document))
+
+        print(blocks_files)
+
+    return blocks_files
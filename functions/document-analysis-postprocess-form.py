@@ -1,17 +1,24 @@
-from textract_util import *
+from textract_results import iterDocumentAnalysisResult, iterResultBlocks, iterBlocksByPage, iterStoredBlocks
+from textract_blocks import BlockDispatcher
+from textract_forms import FormExtractor, formFieldsToEntries
+from textract_output import getOutputSink, PageChunkWriter, recordJobFiles
+from textract_clients import getClient, getResource
 import io
 import os
 import json
 import time
-import boto3
 
 def lambda_handler(event, context):
     
     #Initialize Boto Resource	
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.client('dynamodb')
+    s3 = getResource('s3')
+    textract = getClient('textract')
+    dynamodb = getClient('dynamodb')
     table_name=os.environ['table_name']
+    pages_per_chunk = int(os.environ['pages_per_chunk']) if 'pages_per_chunk' in os.environ else 0
+    #Details added to each field of the structured form data, any of "confidence" and "geometry", comma separated
+    form_data_details = os.environ['form_data_details'].split(',') if 'form_data_details' in os.environ else []
+    form_field_order = os.environ['form_field_order'] if 'form_field_order' in os.environ else "response"
     file_list = []
 
     if "Records" in event:        
@@ -20,7 +27,9 @@ def lambda_handler(event, context):
 
         print("{} messages recieved".format(numRecords))
         for record in records:
-            documentBlocks = None
+            documentPages = None
+            documentMetadata = {}
+            num_blocks = 0
             num_pages = 0     
             num_fields = 0
             bucket = ""
@@ -66,43 +75,75 @@ def lambda_handler(event, context):
 
                     print("upload_prefix = " + upload_prefix)  
 
-                    num_pages, documentBlocks = GetDocumentAnalysisResult(textract, textractJobId) 
+                    #Read the blocks stored by the fetch function when present, instead of retrieving them from Textract again
+                    if 'BlocksLocation' in message.keys():
+                        blocksLocation = message['BlocksLocation']
+                        print("Reading Blocks from {}/{}".format(blocksLocation['S3Bucket'], blocksLocation['S3ObjectName']))
+                        documentMetadata.update(message['DocumentMetadata'])
+                        documentPages = iterBlocksByPage(iterStoredBlocks(s3.meta.client, blocksLocation['S3Bucket'], blocksLocation['S3ObjectName']))
+                    else:
+                        documentPages = iterBlocksByPage(iterResultBlocks(iterDocumentAnalysisResult(textract, textractJobId), documentMetadata))
 
-            if documentBlocks is not None and len(documentBlocks) > 0:
-                print("{} Blocks retrieved".format(len(documentBlocks)))
-        
-                #Extract form fields into a Python dictionary by parsing the raw JSON from Textract
-                blocks = groupBlocksByType(documentBlocks)
-                formKeys, formValues = extractKeyValuePairs(blocks)
-                pageWords = extractWords(blocks)
-                num_fields = len(formKeys.keys())
-        
-                #Generate JSON document using form fields information  
-                formEntries = generateFormEntries(formKeys, formValues, pageWords)   
-        
-                json_document = "{}.json".format(document_name)
-                json_file = open("/tmp/"+json_document,'w+')
-                json_file.write(json.dumps(formEntries, indent=4, sort_keys=True))
-                json_file.close()
-                s3.meta.client.upload_file("/tmp/"+json_document, bucket, "{}/{}".format(upload_prefix,json_document))         
+            #Process the result one document page at a time, as the pages of results arrive from Textract
+            formEntries = {}
+            form_data = []
+            chunkWriter = None
+            #Form fields are extracted from each page in a single pass over its blocks, keeping only the text of the words
+            formExtractor = FormExtractor(confidence=("confidence" in form_data_details), geometry=("geometry" in form_data_details), order=form_field_order)
+            dispatcher = BlockDispatcher([formExtractor])
+            if documentPages is not None:
+                #Leaving the sink waits for every output to be uploaded before they are recorded, and releases its uploads
+                #when the extraction fails
+                with getOutputSink(s3.meta.client, bucket) as sink:
+                    if pages_per_chunk > 0:
+                        chunkWriter = PageChunkWriter(sink, upload_prefix, document_name, "form", pages_per_chunk, sortKeys=False)
+                    for page_number, page_blocks in documentPages:
+                        num_blocks += len(page_blocks)
 
-                try:
-                    response = dynamodb.update_item(
-                        TableName=table_name,
-                        Key={
-                            'JobId':{'S':textractJobId},
-                            'JobType':{'S':'DocumentAnalysis'}
-                        },
-                        ExpressionAttributeNames={"#ff": "FormFiles", "#jst": "JobStatus", "#jct": "JobCompleteTimeStamp", "#nf": "NumFields", "#np": "NumPages"},
-                        UpdateExpression='SET #ff = list_append(#ff, :form_files), #jst = :job_status, #jct = :job_complete, #nf = :num_fields, #np = :num_pages',
-                        ExpressionAttributeValues={
-                            ":form_files": {"L": [{"S": "{}/{}".format(upload_prefix,json_document)}]},
-                            ":job_status": {"S": textractStatus},
-                            ":job_complete": {"N": str(textractTimestamp)},
-                            ":num_fields": {"N": str(num_fields)},
-                            ":num_pages": {"N": str(num_pages)}
+                        #Extract form fields into a Python dictionary by parsing the raw JSON from Textract
+                        dispatcher.reset()
+                        dispatcher.dispatch(page_blocks)
+                        dispatcher.printCounts()
+                        num_fields += len(formExtractor.formKeys.keys())
+
+                        #Generate form fields information for the page, in the order of the fields in the response
+                        pageFields = formExtractor.formFields()
+                        form_data.extend(pageFields)
+                        pageEntries = formFieldsToEntries(pageFields)
+                        for keyText, valueTexts in pageEntries.items():
+                            if keyText not in formEntries.keys():
+                                formEntries[keyText] = list(valueTexts)
+                            else:
+                                formEntries[keyText].extend(valueTexts)
+                        if chunkWriter is not None:
+                            chunkWriter.add(page_number, pageEntries)
+                    num_pages = documentMetadata['Pages'] if 'Pages' in documentMetadata else 0
+
+                    if num_blocks > 0:
+                        #Generate JSON document using form fields information  
+                        json_document = "{}.json".format(document_name)
+                        sink.write("{}/{}".format(upload_prefix,json_document), json.dumps(formEntries, indent=4))
+
+                        #Persist the structured fields, with their page and the details asked for
+                        form_data_key = sink.write("{}/{}-form-data.json".format(upload_prefix, document_name), json.dumps({'Fields': form_data}))
+
+                        #Chunks of pages, along with their index, let retrieval read the fields of a range of pages only
+                        attributes = {
+                            "JobStatus": {"S": textractStatus},
+                            "JobCompleteTimeStamp": {"N": str(textractTimestamp)},
+                            "NumFields": {"N": str(num_fields)},
+                            "NumPages": {"N": str(num_pages)},
+                            "FormData": {"S": form_data_key}
                         }
-                    )
+                        if chunkWriter is not None:
+                            attributes["FormIndex"] = {"S": chunkWriter.close()}
+
+            if num_blocks > 0:
+                print("{} Blocks retrieved".format(num_blocks))
+
+                #The form files are set rather than appended, so that SNS redeliveries simply repeat the update
+                try:
+                    recordJobFiles(dynamodb, table_name, textractJobId, 'DocumentAnalysis', 'FormFiles', ["{}/{}".format(upload_prefix,json_document)], attributes)
                 except Exception as e:
                     print('DynamoDB Insertion Error is: {0}'.format(e))                            
                             
@@ -1,17 +1,25 @@
-from textract_util import *
+from textract_results import iterDocumentAnalysisResult, iterResultBlocks, iterBlocksByPage, iterStoredBlocks
+from textract_blocks import BlockDispatcher
+from textract_tables import TableExtractor, numberTables, writeTableHTML, tableData, TableBundleWriter
+from textract_output import getOutputSink, PageChunkWriter, recordJobFiles
+from textract_clients import getClient, getResource
 import io
 import os
 import json
 import time
-import boto3
 
 def lambda_handler(event, context):
     
     #Initialize Boto Resource	
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.client('dynamodb')
+    s3 = getResource('s3')
+    textract = getClient('textract')
+    dynamodb = getClient('dynamodb')
     table_name=os.environ['table_name']    
+    table_output = os.environ['table_output'] if 'table_output' in os.environ else "files"
+    bundle_pages = int(os.environ['bundle_pages']) if 'bundle_pages' in os.environ else 0
+    table_html = os.environ['table_html'] if 'table_html' in os.environ else "pretty"
+    pages_per_chunk = int(os.environ['pages_per_chunk']) if 'pages_per_chunk' in os.environ else 0
+    cell_word_assignment = os.environ['cell_word_assignment'] if 'cell_word_assignment' in os.environ else "relationships"
     file_list = []
 
     if "Records" in event:        
@@ -20,9 +28,13 @@ def lambda_handler(event, context):
         
         print("{} messages recieved".format(numRecords))
         for record in records:
-            documentBlocks = None
+            documentPages = None
+            documentMetadata = {}
+            num_blocks = 0
             num_pages = 0
             num_tables = 0    
+            table_files = []
+            table_data = []
             bucket = ""
             upload_prefix = ""            
             textractJobId = ""
@@ -63,43 +75,89 @@ def lambda_handler(event, context):
 
                     print("upload_prefix = " + upload_prefix)  
 
-                    num_pages, documentBlocks = GetDocumentAnalysisResult(textract, textractJobId) 
+                    #Read the blocks stored by the fetch function when present, instead of retrieving them from Textract again
+                    if 'BlocksLocation' in message.keys():
+                        blocksLocation = message['BlocksLocation']
+                        print("Reading Blocks from {}/{}".format(blocksLocation['S3Bucket'], blocksLocation['S3ObjectName']))
+                        documentMetadata.update(message['DocumentMetadata'])
+                        documentPages = iterBlocksByPage(iterStoredBlocks(s3.meta.client, blocksLocation['S3Bucket'], blocksLocation['S3ObjectName']))
+                    else:
+                        documentPages = iterBlocksByPage(iterResultBlocks(iterDocumentAnalysisResult(textract, textractJobId), documentMetadata))
 
-            if documentBlocks is not None and len(documentBlocks) > 0:
-                print("{} Blocks retrieved".format(len(documentBlocks)))
+            #Process the result one document page at a time, as the pages of results arrive from Textract
+            bundleWriter = None
+            chunkWriter = None
+            table_data_key = None
+            table_data_index_key = None
+            #Tables are extracted from each page in a single pass over its blocks
+            tableExtractor = TableExtractor(cellWords=cell_word_assignment)
+            dispatcher = BlockDispatcher([tableExtractor])
+            if documentPages is not None:
+                #Leaving the sink waits for every output to be uploaded before they are recorded, and releases its uploads
+                #when the extraction fails
+                with getOutputSink(s3.meta.client, bucket) as sink:
+                    if pages_per_chunk > 0:
+                        chunkWriter = PageChunkWriter(sink, upload_prefix, document_name, "tables", pages_per_chunk)
+                    if table_output == "bundle":
+                        bundleWriter = TableBundleWriter(sink, upload_prefix, document_name, bundle_pages)
+                    for page_number, page_blocks in documentPages:
+                        num_blocks += len(page_blocks)
+                        num_pages = documentMetadata['Pages'] if 'Pages' in documentMetadata else 0
 
-                #Extract table information  into a Python dictionary by parsing the raw JSON from Textract
-                tabledict = extractTableBlocks(documentBlocks)
-                
-                #Generate XML document using table information    
-                num_tables, tables = generateTableXML(tabledict)
-                
-                for page in tables:
-                    for table in page:
-                        html_document = "{}-page-{}-table-{}.html".format(document_name, table.attrib['ContainingPage'], table.attrib['TableNumber'])
-                        html_file = open("/tmp/"+html_document,'w+')
-                        html_file.write(prettify(table))
-                        html_file.close()
-                        s3.meta.client.upload_file("/tmp/"+html_document, bucket, "{}/{}".format(upload_prefix,html_document))  
-                        try:
-                            response = dynamodb.update_item(
-                                TableName=table_name,
-                                Key={
-                                    'JobId':{'S':textractJobId},
-                                    'JobType':{'S':'DocumentAnalysis'}
-                                },
-                                ExpressionAttributeNames={"#tf": "TableFiles", "#jst": "JobStatus", "#jct": "JobCompleteTimeStamp", "#nt": "NumTables", "#np": "NumPages"},
-                                UpdateExpression='SET #tf = list_append(#tf, :table_files), #jst = :job_status, #jct = :job_complete, #nt = :num_tables, #np = :num_pages',
-                                ExpressionAttributeValues={
-                                    ":table_files": {"L": [{"S": "{}/{}".format(upload_prefix,html_document)}]},
-                                    ":job_status": {"S": textractStatus},
-                                    ":job_complete": {"N": str(textractTimestamp)},
-                                    ":num_tables": {"N": str(num_tables)},
-                                    ":num_pages": {"N": str(num_pages)}
-                                }
-                            )
-                        except Exception as e:
-                            print('DynamoDB Insertion Error is: {0}'.format(e))
+                        #Extract table information  into a Python dictionary by parsing the raw JSON from Textract
+                        dispatcher.reset()
+                        dispatcher.dispatch(page_blocks)
+                        tabledict = tableExtractor.result()
+                    
+                        #Generate HTML document for each table straight from the table information
+                        page_tables, tables = numberTables(tabledict)
+                        num_tables += page_tables
+                        page_data = []
+                    
+                        for page in tables:
+                            for tkey, tableNumber in page:
+                                page_data.append(tableData(tkey, tabledict[tkey], tableNumber))
+                                html = writeTableHTML(tkey, tabledict[tkey], tableNumber, compact=(table_html == "compact"))
+                                if bundleWriter is not None:
+                                    bundleWriter.add(page_number, tableNumber, tkey, html)
+                                else:
+                                    html_document = "{}-page-{}-table-{}.html".format(document_name, tabledict[tkey]['ContainingPage'], tableNumber)
+                                    table_files.append(sink.write("{}/{}".format(upload_prefix,html_document), html))
+                        table_data.extend(page_data)
+                        if chunkWriter is not None:
+                            chunkWriter.add(page_number, page_data)
+
+                    #Persist the structured tables, so that retrieval can return them without parsing the HTML back
+                    if num_blocks > 0:
+                        table_data_key = sink.write("{}/{}-tables.json".format(upload_prefix, document_name), json.dumps({'Tables': table_data}))
+                    if chunkWriter is not None and num_blocks > 0:
+                        table_data_index_key = chunkWriter.close()
+                    if bundleWriter is not None and num_blocks > 0:
+                        bundleIndexKey = bundleWriter.close()
+
+            if num_blocks > 0:
+                #Record all table files or bundles of the job at once, rather than with one write per table
+                attributes = {
+                    "JobStatus": {"S": textractStatus},
+                    "JobCompleteTimeStamp": {"N": str(textractTimestamp)},
+                    "NumTables": {"N": str(num_tables)},
+                    "NumPages": {"N": str(num_pages)},
+                    "TableData": {"S": table_data_key}
+                }
+                if table_data_index_key is not None:
+                    attributes["TableDataIndex"] = {"S": table_data_index_key}
+                if bundleWriter is not None:
+                    attributes["TableBundleIndex"] = {"S": bundleIndexKey}
+                try:
+                    if bundleWriter is not None:
+                        recordJobFiles(dynamodb, table_name, textractJobId, 'DocumentAnalysis', 'TableBundles', bundleWriter.bundles, attributes)
+                    else:
+                        recordJobFiles(dynamodb, table_name, textractJobId, 'DocumentAnalysis', 'TableFiles', table_files, attributes)
+                except Exception as e:
+                    print('DynamoDB Insertion Error is: {0}'.format(e))
+
+            if num_blocks > 0:
+                print("{} Blocks retrieved".format(num_blocks))
             else:
                 try:
                     response = dynamodb.update_item(
@@ -122,14 +180,14 @@ def lambda_handler(event, context):
             if 'Contents' in s3_result:
                 
                 for key in s3_result['Contents']:
-                    if key['Key'].endswith("html"):
+                    if key['Key'].endswith("html") or key['Key'].endswith(".bundle"):
                         file_list.append("https://s3.amazonaws.com/{}/{}".format(bucket, key['Key']))
                 
                 while s3_result['IsTruncated']:
                     continuation_key = s3_result['NextContinuationToken']
                     s3_result = s3.meta.client.list_objects_v2(Bucket=bucket, Prefix="{}/".format(upload_prefix), Delimiter="/", ContinuationToken=continuation_key)
                     for key in s3_result['Contents']:
-                        if key['Key'].endswith("html"):
+                        if key['Key'].endswith("html") or key['Key'].endswith(".bundle"):
                             file_list.append("https://s3.amazonaws.com/{}/{}".format(bucket, key['Key']))            
             print(file_list)   
         
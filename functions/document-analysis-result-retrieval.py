@@ -2,15 +2,184 @@ import io
 import os
 import json
 import time
-import boto3
 from datetime import datetime
-from xml.etree import ElementTree
-from textract_util import *
+from textract_retrieval import findLatestJob, getMaxConcurrentReads, fetchObjects, summarizeFetchTimings, selectPages, fetchPageRange, fetchBundledTables
+from textract_tables import parseTableHTML, tableDataToDict, tableDataToHTML
+from textract_forms import formFieldsToEntries
+from textract_clients import getClient, getResource
+from textract_cache import getResultCache, getResultVersion, getResultETag, matchesETag
+
+#Client shared by all invocations of the container, with a connection pool large enough for all concurrent reads
+s3client = getClient('s3', getMaxConcurrentReads())
+
+#Function to list the result files a result type is read from, which its cached copy is validated against
+def getResultFiles(item, resultType, selection=None):
+    if resultType == "FORMDATA":
+        return [item['FormData']] if 'FormData' in item else []
+    if selection is not None:
+        return getPagedResultFiles(item, resultType)
+    files = []
+    if resultType == "FORM" or resultType == "ALL":
+        files.extend(item['FormFiles'])
+    if resultType != "FORM":
+        if 'TableData' in item:
+            files.append(item['TableData'])
+        elif resultType != "TABLEDATA" and 'TableBundleIndex' in item:
+            files.append(item['TableBundleIndex'])
+            files.extend(item['TableBundles'])
+        elif resultType != "TABLEDATA":
+            files.extend(item['TableFiles'])
+    return files
+
+#Function to list the result files a range of pages is read from, the chunk indexes when the job has them
+def getPagedResultFiles(item, resultType):
+    files = []
+    if resultType == "FORM" or resultType == "ALL":
+        if 'FormIndex' in item:
+            files.append(item['FormIndex'])
+        elif 'FormData' in item:
+            files.append(item['FormData'])
+    if resultType != "FORM":
+        if 'TableDataIndex' in item:
+            files.append(item['TableDataIndex'])
+        elif 'TableData' in item:
+            files.append(item['TableData'])
+    return files
+
+#Function to read the structured form fields of a job, only those of a range of pages when given one
+def fetchFormData(item, timing, selection=None):
+    result = {}
+    if 'FormData' not in item:
+        result["Error"] = "Structured form data not available for job {}".format(item['JobId'])
+        return result, 0
+    fetchStarted = time.time()
+    formResults = fetchObjects(s3client, item['DocumentBucket'], [item['FormData']], json.loads)
+    formFields = formResults[0][0]['Fields']
+    if selection is not None:
+        formFields = [field for field in formFields if selection['FirstPage'] <= field['Page'] <= selection['LastPage']]
+    result['formfields'] = formFields
+    timing['FormFiles'] = summarizeFetchTimings([formResults[0][1]], time.time() - fetchStarted)
+    return result, timing['FormFiles']['Bytes']
+
+#Function to read and assemble the tables and form fields of a range of pages of a job
+#Pages are read from the chunks overlapping the range, or, for jobs processed without chunks, from the whole outputs
+def fetchPagedResult(item, resultType, selection, timing):
+    if resultType == "FORMDATA":
+        return fetchFormData(item, timing, selection)
+    documentBucket = item['DocumentBucket']
+    firstPage = selection['FirstPage']
+    lastPage = selection['LastPage']
+    result = {}
+    if resultType == "FORM" or resultType == "ALL":
+        fetchStarted = time.time()
+        if 'FormIndex' in item:
+            pages, formTimings = fetchPageRange(s3client, documentBucket, item['FormIndex'], firstPage, lastPage)
+            formEntries = {}
+            for pageNumber, pageEntries in pages:
+                for keyText, valueTexts in pageEntries.items():
+                    if keyText not in formEntries.keys():
+                        formEntries[keyText] = list(valueTexts)
+                    else:
+                        formEntries[keyText].extend(valueTexts)
+            result['formfields'] = formEntries
+        elif 'FormData' in item:
+            #Jobs processed without chunks are read from the structured form fields, which carry their page
+            formResults = fetchObjects(s3client, documentBucket, [item['FormData']], json.loads)
+            result['formfields'] = formFieldsToEntries([field for field in formResults[0][0]['Fields'] if firstPage <= field['Page'] <= lastPage])
+            formTimings = [formTiming for formjson, formTiming in formResults]
+        else:
+            result["Error"] = "Page selection not available for the form fields of job {}".format(item['JobId'])
+            return result, 0
+        timing['FormFiles'] = summarizeFetchTimings(formTimings, time.time() - fetchStarted)
+
+    if resultType != "FORM":
+        fetchStarted = time.time()
+        if 'TableDataIndex' in item:
+            pages, tableTimings = fetchPageRange(s3client, documentBucket, item['TableDataIndex'], firstPage, lastPage)
+            tables = [data for pageNumber, pageTables in pages for data in pageTables]
+        elif 'TableData' in item:
+            tableResults = fetchObjects(s3client, documentBucket, [item['TableData']], json.loads)
+            tables = [data for data in tableResults[0][0]['Tables'] if firstPage <= data['ContainingPage'] <= lastPage]
+            tableTimings = [tableTiming for tables, tableTiming in tableResults]
+        else:
+            result["Error"] = "Page selection not available for the tables of job {}".format(item['JobId'])
+            return result, 0
+        if resultType == "TABLEDATA":
+            result['tables'] = tables
+        elif resultType == "TABLEHTML":
+            result['tables'] = [tableDataToHTML(data) for data in tables]
+        else:
+            result['tables'] = [tableDataToDict(data) for data in tables]
+        timing['TableFiles'] = summarizeFetchTimings(tableTimings, time.time() - fetchStarted)
+
+    numBytes = sum([timing[files]['Bytes'] for files in ('FormFiles', 'TableFiles') if files in timing])
+    return result, numBytes
+
+#Function to read and assemble the tables and form fields of a job from the result files
+def fetchResult(item, resultType, timing):
+    if resultType == "FORMDATA":
+        return fetchFormData(item, timing)
+    documentBucket = item['DocumentBucket']
+    result = {}
+    if resultType == "FORM" or resultType == "ALL":
+        formFiles = item['FormFiles']
+        print("Form Fields stored in {} files".format(len(formFiles)))
+        fetchStarted = time.time()
+        formResults = fetchObjects(s3client, documentBucket, formFiles, json.loads)
+        for formjson, formTiming in formResults:
+            result['formfields'] = formjson
+        timing['FormFiles'] = summarizeFetchTimings([formTiming for formjson, formTiming in formResults], time.time() - fetchStarted)
+
+    if resultType == "TABLE" or resultType == "ALL":
+        fetchStarted = time.time()
+        if 'TableData' in item:
+            #Structured tables convert straight to the dictionaries otherwise parsed back from the HTML
+            print("Table data stored in {}".format(item['TableData']))
+            tableResults = fetchObjects(s3client, documentBucket, [item['TableData']], json.loads)
+            result['tables'] = [tableDataToDict(data) for data in tableResults[0][0]['Tables']]
+            tableTimings = [tableTiming for tables, tableTiming in tableResults]
+        elif 'TableBundleIndex' in item:
+            print("Table data stored in {} bundles".format(len(item['TableBundles'])))
+            result['tables'], tableTimings = fetchBundledTables(s3client, documentBucket, item['TableBundleIndex'], parseTableHTML)
+        else:
+            tableFiles = item['TableFiles']
+            print("Table data stored in {} files".format(len(tableFiles)))
+            tableResults = fetchObjects(s3client, documentBucket, tableFiles, parseTableHTML)
+            result['tables'] = [table for table, tableTiming in tableResults]
+            tableTimings = [tableTiming for table, tableTiming in tableResults]
+        timing['TableFiles'] = summarizeFetchTimings(tableTimings, time.time() - fetchStarted)
+
+    if resultType == "TABLEDATA":
+        if 'TableData' in item:
+            fetchStarted = time.time()
+            tableResults = fetchObjects(s3client, documentBucket, [item['TableData']], json.loads)
+            result['tables'] = tableResults[0][0]['Tables']
+            timing['TableFiles'] = summarizeFetchTimings([tableResults[0][1]], time.time() - fetchStarted)
+        else:
+            result["Error"] = "Structured table data not available for job {}".format(item['JobId'])
+
+    if resultType == "TABLEHTML":
+        fetchStarted = time.time()
+        decode = lambda body: body.decode('utf-8')
+        if 'TableData' in item:
+            #HTML is rendered from the structured tables only when asked for
+            tableResults = fetchObjects(s3client, documentBucket, [item['TableData']], json.loads)
+            result['tables'] = [tableDataToHTML(data) for data in tableResults[0][0]['Tables']]
+            tableTimings = [tableTiming for tables, tableTiming in tableResults]
+        elif 'TableBundleIndex' in item:
+            result['tables'], tableTimings = fetchBundledTables(s3client, documentBucket, item['TableBundleIndex'], decode)
+        else:
+            tableResults = fetchObjects(s3client, documentBucket, item['TableFiles'], decode)
+            result['tables'] = [table for table, tableTiming in tableResults]
+            tableTimings = [tableTiming for table, tableTiming in tableResults]
+        timing['TableFiles'] = summarizeFetchTimings(tableTimings, time.time() - fetchStarted)
+
+    numBytes = sum([timing[files]['Bytes'] for files in ('FormFiles', 'TableFiles') if files in timing])
+    return result, numBytes
 
 def lambda_handler(event, context):    
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.resource('dynamodb')
+    started = time.time()
+    dynamodb = getResource('dynamodb')
     table_name=os.environ['table_name']
     table = dynamodb.Table(table_name)    
    
@@ -19,9 +188,12 @@ def lambda_handler(event, context):
     resultType = "ALL"
     if 'ResultType' in event and event['ResultType'] != "":
         resultType = event['ResultType'].upper()
+    ifNoneMatch = event['IfNoneMatch'] if 'IfNoneMatch' in event else None
+    debug = 'Debug' in event and str(event['Debug']).lower() in ("true", "1", "yes")
+    timing = {}
     print("Invoking retrieval function for result type {}".format(resultType))
     jsonresponse = {}
-    if resultType != "ALL" and resultType != "TABLE" and resultType != "FORM":
+    if resultType not in ("ALL", "TABLE", "FORM", "FORMDATA", "TABLEDATA", "TABLEHTML"):
         jsonresponse["Error"] = "Invalid Result Type {}".format(resultType)
         return jsonresponse
 
@@ -30,18 +202,7 @@ def lambda_handler(event, context):
     jobCompleteTimeStamp = None  
 
     try:
-        response = table.scan(
-            FilterExpression = "DocumentBucket = :bucket and DocumentKey = :key and JobType =:jobType",
-            ExpressionAttributeValues = {
-                ":bucket": documentBucket,
-                ":key": documentKey,
-                ":jobType": 'DocumentAnalysis'
-            }
-        )
-        recordsMatched = len(response['Items'])
-        print("{} matching records found for {}/{}".format(recordsMatched, documentBucket, documentKey))
-        if recordsMatched > 0:
-            item = response['Items'][-1]
+        item = findLatestJob(table, documentBucket, documentKey, 'DocumentAnalysis')
     except Exception as e:
         print('Actual error is: {0}'.format(e))
 
@@ -66,29 +227,47 @@ def lambda_handler(event, context):
         jsonresponse['NumTables'] = str(item['NumTables'])
         jsonresponse['NumFields'] = str(item['NumFields'])                
     
-        if resultType == "FORM" or resultType == "ALL":
-            formFiles = item['FormFiles']
-            print("Form Fields stored in {} files".format(len(formFiles)))
-            for formFile in formFiles:
-                s3_object = s3.Object(documentBucket,formFile)
-                print("Reading Form fields from {}".format(formFile))
-                s3_response = s3_object.get()
-                jsonstring = s3_response['Body'].read()
-
-                formjson = json.loads(jsonstring)
-                jsonresponse['formfields'] = formjson    
-
-        if resultType == "TABLE" or resultType == "ALL":
-            tableFiles = item['TableFiles']
-            jsonresponse['tables'] = []     
-            print("Table data stored in {} files".format(len(tableFiles)))
-            for tableFile in tableFiles:
-                s3_object = s3.Object(documentBucket,tableFile)
-                print("Reading Form fields from {}".format(tableFile))
-                s3_response = s3_object.get()
-                xmlstring = s3_response['Body'].read()
-
-                tablexml = ElementTree.fromstring(xmlstring)
-                jsonresponse['tables'].append(etree_to_dict(tablexml))
+        timing['Lookup'] = round(time.time() - started, 4)
+
+        try:
+            selection = selectPages(event, item['JobId'], int(item['NumPages']))
+        except ValueError as e:
+            jsonresponse["Error"] = str(e)
+            return jsonresponse
+        variant = resultType
+        if selection is not None:
+            jsonresponse.update(selection)
+            variant = "{}:{}-{}".format(resultType, selection['FirstPage'], selection['LastPage'])
+
+        resultFiles = getResultFiles(item, resultType, selection)
+        etag = getResultETag(item['JobId'], jobCompleteTimeStamp, resultFiles, variant)
+        jsonresponse['ETag'] = etag
+        if matchesETag(ifNoneMatch, etag):
+            #The caller already holds this result, only the job status is returned
+            print("Result {} of job {} not modified".format(etag, item['JobId']))
+            jsonresponse = {'JobId': item['JobId'], 'JobStatus': jsonresponse['JobStatus'], 'ETag': etag, 'NotModified': True}
+            if selection is not None:
+                jsonresponse.update(selection)
+        else:
+            cache = getResultCache()
+            cacheKey = (item['JobId'], variant)
+            version = getResultVersion(s3client, documentBucket, item, resultFiles)
+            result = cache.get(cacheKey, version) if version is not None else None
+            if result is not None:
+                print("Result cache hit for {} of job {}".format(resultType, item['JobId']))
+            else:
+                if selection is not None:
+                    result, numBytes = fetchPagedResult(item, resultType, selection, timing)
+                else:
+                    result, numBytes = fetchResult(item, resultType, timing)
+                if version is not None and 'Error' not in result:
+                    cache.put(cacheKey, version, result, numBytes)
+            jsonresponse.update(result)
+            print("Result cache: {}".format(json.dumps(cache.stats())))
+            timing['Cache'] = cache.stats()
+
+    if debug:
+        timing['Total'] = round(time.time() - started, 4)
+        jsonresponse['Timing'] = timing
 
     return jsonresponse
\ No newline at end of file
@@ -1,11 +1,17 @@
 import os
+import json
 import time
-import boto3
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from textract_ratelimit import getSubmissionGovernor
+from textract_clients import getClient
+
+#Document types accepted by Textract asynchronous operations
+SUPPORTED_DOCUMENT_TYPES = ("PDF", "PNG", "JPG", "JPEG", "TIF", "TIFF")
 
 
 def attachExternalBucketPolicy(externalBucketName):
-    iam = boto3.client('iam')
+    iam = getClient('iam')
     roleName = os.environ['role_name']
     policyName = externalBucketName+'-bucketaccesspolicy'
     
@@ -86,7 +92,7 @@ def attachExternalBucketPolicy(externalBucketName):
     
 def detachExternalBucketPolicy(bucketAccessPolicyArn, event):
     
-    iam = boto3.client('iam')
+    iam = getClient('iam')
     roleName = os.environ['role_name']
     
     cleanUpAction = ""
@@ -116,11 +122,35 @@ def updateResponse(givenjson, updatejson, override = False):
             givenjson[key] = updatejson[key]
     return givenjson
 
-def submitDocumentAnalysisJob(bucket, document, tokenPrefix, retryInterval, maxRetryAttempt, topicArn, roleArn, table_name):
+#Function to create a job record in a single write, keeping any attribute already recorded for the job
+#Resubmitting a document returns the existing job, so its record is returned as it stands, with its results
+def createJobRecord(dynamodb, table_name, jobId, jobType, attributes):
+    names = {}
+    values = {}
+    updates = []
+    for i, (name, value) in enumerate(attributes.items()):
+        names['#a{}'.format(i)] = name
+        values[':a{}'.format(i)] = value
+        updates.append('#a{0} = if_not_exists(#a{0}, :a{0})'.format(i))
+    response = dynamodb.update_item(
+        TableName=table_name,
+        Key={
+            'JobId':{'S':jobId},
+            'JobType':{'S':jobType}
+        },
+        UpdateExpression='SET ' + ', '.join(updates),
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues='ALL_NEW'
+    )
+    return response['Attributes']
+
+def submitDocumentAnalysisJob(bucket, document, tokenPrefix, retryInterval, maxRetryAttempt, topicArn, roleArn, table_name, textract=None, dynamodb=None, governor=None):
 
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.client('dynamodb')    
+    if textract is None:
+        textract = getClient('textract')
+    if dynamodb is None:
+        dynamodb = getClient('dynamodb')    
     retryCount = 0
     jsonresponse = {}
     jobId = ""
@@ -135,8 +165,18 @@ def submitDocumentAnalysisJob(bucket, document, tokenPrefix, retryInterval, maxR
     print("DocumentAnalysisJob: NotificationChannel = 'SNSTopicArn': {},'RoleArn': {}".format(topicArn, roleArn))
     print("DocumentAnalysisJob: JobTag = {}-{}".format(tokenPrefix, document[document.rfind("/")+1:document.rfind(".")]))
             
+    #Wait for an open job slot, so that the job quota is not exceeded
+    slot = governor.acquireJobSlot() if governor is not None else None
+    if governor is not None and slot is None:
+        print("No open job slot became available within {} seconds, aborting".format(governor.timeout))
+        return {'Operation': 'DocumentAnalysis', 'Error': 'OpenJobLimitExceeded'}
+
     #Submit Document Anlysis job to Textract to extract text features    
     while retryCount >= 0 and retryCount < maxRetryAttempt:
+        if governor is not None and not governor.acquireStartToken():
+            print("No start token became available within {} seconds, aborting".format(governor.timeout))
+            governor.releaseJobSlot(slot)
+            return {'Operation': 'DocumentAnalysis', 'Error': 'StartRateExceeded'}
         try:
             response = textract.start_document_analysis(
                                     ClientRequestToken = "{}-{}".format(tokenPrefix, document.replace("/","_").replace(".","-")),
@@ -152,6 +192,8 @@ def submitDocumentAnalysisJob(bucket, document, tokenPrefix, retryInterval, maxR
             print("Starting Document Analysis Job: {}".format(jobId))        
         except Exception as e:
             print(e.response['Error'])
+            if governor is not None and (e.response['Error']['Code'] == 'InvalidParameterException' or retryCount >= maxRetryAttempt - 1):
+                governor.releaseJobSlot(slot)
             if e.response['Error']['Code'] == 'InvalidParameterException':
                 return {'Operation': 'DocumentAnalysis', 'Error': e.response['Error']['Code']}
             elif retryCount < maxRetryAttempt - 1:
@@ -184,69 +226,43 @@ def submitDocumentAnalysisJob(bucket, document, tokenPrefix, retryInterval, maxR
     jsonresponse['TableFiles'] = []
     jsonresponse['FormFiles'] = []        
 
-    
-    recordExists = False
-    
+    #Create the job record unless it already exists, and read it back in the same request
     try:
-        response = dynamodb.scan(
-            TableName=table_name,
-            ExpressionAttributeNames={'#ID': 'JobId', '#Type': 'JobType'},
-            ExpressionAttributeValues={':jobId' : {'S': jobId}, ':jobType' : {'S': 'DocumentAnalysis'}},
-            FilterExpression='#ID = :jobId and #Type = :jobType'
-        )      
-        if response['Count'] > 0:
-            recordExists = True
-            item = response['Items'][-1]
-            jsonresponse['JobStartTimeStamp'] = int(item['JobStartTimeStamp']['N'])
-            jsonresponse['JobCompleteTimeStamp'] = int(item['JobCompleteTimeStamp']['N'])
-            jsonresponse['NumPages'] = int(item['NumPages']['N'])
-            jsonresponse['NumTables'] = int(item['NumTables']['N'])
-            jsonresponse['NumFields'] = int(item['NumFields']['N'])            
-            tableFiles = []            
-            for tableFile in item['TableFiles']['L']:
-                tableFiles.append(tableFile['S'])
-            jsonresponse['TableFiles'] = tableFiles
-            formFiles = []
-            for formFile in item['FormFiles']['L']:
-                formFiles.append(formFile['S'])            
-            jsonresponse['FormFiles'] = formFiles                 
-            
+        item = createJobRecord(dynamodb, table_name, jobId, 'DocumentAnalysis', {
+                    'DocumentBucket': {'S':bucket},
+                    'DocumentKey': {'S':document},
+                    'UploadPrefix': {'S':upload_prefix},
+                    'DocumentName': {'S':document_name},
+                    'DocumentType': {'S':document_type},
+                    'JobStartTimeStamp': {'N':str(jobStartTimeStamp)},
+                    'JobCompleteTimeStamp': {'N':'0'},
+                    'NumPages': {'N':'0'},
+                    'NumTables': {'N':'0'},
+                    'NumFields': {'N':'0'},
+                    'TableFiles': {'L':[]},
+                    'FormFiles': {'L':[]}
+                })
+        jsonresponse['JobStartTimeStamp'] = int(float(item['JobStartTimeStamp']['N']))
+        jsonresponse['JobCompleteTimeStamp'] = int(float(item['JobCompleteTimeStamp']['N']))
+        jsonresponse['NumPages'] = int(item['NumPages']['N'])
+        jsonresponse['NumTables'] = int(item['NumTables']['N'])
+        jsonresponse['NumFields'] = int(item['NumFields']['N'])
+        jsonresponse['TableFiles'] = [tableFile['S'] for tableFile in item['TableFiles']['L']]
+        jsonresponse['FormFiles'] = [formFile['S'] for formFile in item['FormFiles']['L']]
     except Exception as e:
-        print('DynamoDB Read Error is: {0}'.format(e))  
-    
-    if not recordExists:
-        try:
-            response = dynamodb.update_item(
-                TableName=table_name,
-                Key={
-                    'JobId':{'S':jobId},
-                    'JobType':{'S':'DocumentAnalysis'}
-                },
-                AttributeUpdates={
-                    'DocumentBucket':{'Value': {'S':bucket}},
-                    'DocumentKey':{'Value': {'S':document}},
-                    'UploadPrefix':{'Value': {'S':upload_prefix}},
-                    'DocumentName':{'Value': {'S':document_name}},
-                    'DocumentType':{'Value': {'S':document_type}},                        
-                    'JobStartTimeStamp':{'Value': {'N':str(jobStartTimeStamp)}},
-                    'JobCompleteTimeStamp':{'Value': {'N':'0'}},
-                    'NumPages':{'Value': {'N':'0'}},
-                    'NumTables':{'Value': {'N':'0'}},
-                    'NumFields':{'Value': {'N':'0'}},                        
-                    'TableFiles':{'Value': {'L':[]}},
-                    'FormFiles':{'Value': {'L':[]}}
-                }
-            )
-        except Exception as e:
-            print('DynamoDB Insertion Error is: {0}'.format(e))
+        print('DynamoDB Insertion Error is: {0}'.format(e))
+
+    if governor is not None:
+        governor.claimJob(jobId, 'DocumentAnalysis', slot)
 
     return jsonresponse
         
-def submitTextDetectionJob(bucket, document, tokenPrefix, retryInterval, maxRetryAttempt, topicArn, roleArn, table_name):
+def submitTextDetectionJob(bucket, document, tokenPrefix, retryInterval, maxRetryAttempt, topicArn, roleArn, table_name, textract=None, dynamodb=None, governor=None):
 
-    s3 = boto3.resource('s3')
-    textract = boto3.client('textract')
-    dynamodb = boto3.client('dynamodb')    
+    if textract is None:
+        textract = getClient('textract')
+    if dynamodb is None:
+        dynamodb = getClient('dynamodb')    
     retryCount = 0
     jsonresponse = {}
     jobId = ""
@@ -261,8 +277,18 @@ def submitTextDetectionJob(bucket, document, tokenPrefix, retryInterval, maxRetr
     print("TextDetectionJob: NotificationChannel = 'SNSTopicArn': {},'RoleArn': {}".format(topicArn, roleArn))
     print("TextDetectionJob: JobTag = {}-{}".format(tokenPrefix, document[document.rfind("/")+1:document.rfind(".")]))
     
+    #Wait for an open job slot, so that the job quota is not exceeded
+    slot = governor.acquireJobSlot() if governor is not None else None
+    if governor is not None and slot is None:
+        print("No open job slot became available within {} seconds, aborting".format(governor.timeout))
+        return {'Operation': 'TextDetection', 'Error': 'OpenJobLimitExceeded'}
+
     #Submit Text Detection job to Textract to detect lines of text    
     while retryCount >= 0 and retryCount < maxRetryAttempt:
+        if governor is not None and not governor.acquireStartToken():
+            print("No start token became available within {} seconds, aborting".format(governor.timeout))
+            governor.releaseJobSlot(slot)
+            return {'Operation': 'TextDetection', 'Error': 'StartRateExceeded'}
         try:
             response = textract.start_document_text_detection(
                                     ClientRequestToken = "{}-{}".format(tokenPrefix, document.replace("/","_").replace(".","-")),
@@ -278,6 +304,8 @@ def submitTextDetectionJob(bucket, document, tokenPrefix, retryInterval, maxRetr
 
         except Exception as e:
             print(e.response['Error'])
+            if governor is not None and (e.response['Error']['Code'] == 'InvalidParameterException' or retryCount >= maxRetryAttempt - 1):
+                governor.releaseJobSlot(slot)
             if e.response['Error']['Code'] == 'InvalidParameterException':
                 return {'Operation': 'TextDetection', 'Error': e.response['Error']['Code']}
             elif retryCount < maxRetryAttempt - 1:
@@ -308,71 +336,225 @@ def submitTextDetectionJob(bucket, document, tokenPrefix, retryInterval, maxRetr
     jsonresponse['NumLines'] = '0'
     jsonresponse['TextFiles'] = []        
 
-    
-    recordExists = False
-    
+    #Create the job record unless it already exists, and read it back in the same request
     try:
-        response = dynamodb.scan(
-            TableName=table_name,
-            ExpressionAttributeNames={'#ID': 'JobId', '#Type': 'JobType'},
-            ExpressionAttributeValues={':jobId' : {'S': jobId}, ':jobType' : {'S': 'TextDetection'}},
-            FilterExpression='#ID = :jobId and #Type = :jobType'
-        )                  
-        if response['Count'] > 0:
-            recordExists = True
-            item = response['Items'][-1]
-            jsonresponse['JobStartTimeStamp'] = int(item['JobStartTimeStamp']['N'])
-            jsonresponse['JobCompleteTimeStamp'] = int(item['JobCompleteTimeStamp']['N'])
-            jsonresponse['NumPages'] = int(item['NumPages']['N'])
-            jsonresponse['NumLines'] = int(item['NumLines']['N'])
-            textFiles = []
-            for textFile in item['TextFiles']['L']:
-                textFiles.append(textFile['S'])            
-            jsonresponse['TextFiles'] = textFiles                  
-            
+        item = createJobRecord(dynamodb, table_name, jobId, 'TextDetection', {
+                    'DocumentBucket': {'S':bucket},
+                    'DocumentKey': {'S':document},
+                    'UploadPrefix': {'S':upload_prefix},
+                    'DocumentName': {'S':document_name},
+                    'DocumentType': {'S':document_type},
+                    'JobStartTimeStamp': {'N':str(jobStartTimeStamp)},
+                    'JobCompleteTimeStamp': {'N':'0'},
+                    'NumPages': {'N':'0'},
+                    'NumLines': {'N':'0'},
+                    'TextFiles': {'L':[]}
+                })
+        jsonresponse['JobStartTimeStamp'] = int(float(item['JobStartTimeStamp']['N']))
+        jsonresponse['JobCompleteTimeStamp'] = int(float(item['JobCompleteTimeStamp']['N']))
+        jsonresponse['NumPages'] = int(item['NumPages']['N'])
+        jsonresponse['NumLines'] = int(item['NumLines']['N'])
+        jsonresponse['TextFiles'] = [textFile['S'] for textFile in item['TextFiles']['L']]
     except Exception as e:
-        print('DynamoDB Read Error is: {0}'.format(e))  
-    
-    if not recordExists:
-        try:
-            response = dynamodb.update_item(
-                TableName=table_name,
-                Key={
-                    'JobId':{'S':jobId},
-                    'JobType':{'S':'TextDetection'}
-                },
-                AttributeUpdates={
-                    'DocumentBucket':{'Value': {'S':bucket}},
-                    'DocumentKey':{'Value': {'S':document}},
-                    'UploadPrefix':{'Value': {'S':upload_prefix}},
-                    'DocumentName':{'Value': {'S':document_name}},
-                    'DocumentType':{'Value': {'S':document_type}},                        
-                    'JobStartTimeStamp':{'Value': {'N':str(jobStartTimeStamp)}},
-                    'JobCompleteTimeStamp':{'Value': {'N':'0'}},
-                    'NumPages':{'Value': {'N':'0'}},
-                    'NumLines':{'Value': {'N':'0'}},
-                    'TextFiles':{'Value': {'L':[]}}
-                }
-            )
-        except Exception as e:
-            print('DynamoDB Insertion Error is: {0}'.format(e))
+        print('DynamoDB Insertion Error is: {0}'.format(e))
+
+    if governor is not None:
+        governor.claimJob(jobId, 'TextDetection', slot)
 
     return jsonresponse
         
+#Function to build the governors pacing job starts of both Textract operations, as configured in the environment
+def getSubmissionGovernors(settings, dynamodb=None):
+    if dynamodb is None:
+        dynamodb = getClient('dynamodb')
+    return {
+        'DocumentAnalysis': getSubmissionGovernor('DocumentAnalysis', dynamodb, settings['table_name']),
+        'TextDetection': getSubmissionGovernor('TextDetection', dynamodb, settings['table_name'])
+    }
+
+#Function to submit both analysis and text detection jobs for one document
+def submitDocument(bucket, document, settings, textract=None, dynamodb=None, governors=None):
+    if governors is None:
+        governors = getSubmissionGovernors(settings, dynamodb)
+    documentAnalysisResponse = submitDocumentAnalysisJob(bucket, document, 
+                                                        settings['document_analysis_token_prefix'], 
+                                                        settings['retry_interval'], settings['max_retry_attempt'], 
+                                                        settings['document_analysis_topic_arn'], 
+                                                        settings['role_arn'], settings['table_name'],
+                                                        textract, dynamodb, governors['DocumentAnalysis'])
+    print("DocumentAnalysisResponse = {}".format(documentAnalysisResponse))
+
+    textDetectionResponse = submitTextDetectionJob(bucket, document, 
+                                                    settings['text_detection_token_prefix'], 
+                                                    settings['retry_interval'], settings['max_retry_attempt'], 
+                                                    settings['text_detection_topic_arn'], 
+                                                    settings['role_arn'], settings['table_name'],
+                                                    textract, dynamodb, governors['TextDetection'])
+    print("TextDetectionResponse = {}".format(textDetectionResponse))
+        
+    return updateResponse(documentAnalysisResponse, textDetectionResponse, False)
+
+#Function to list the documents to submit in bulk, one page at a time, along with the position to resume from after each page
+def listBulkDocuments(s3, bucket, prefix, manifest, position, pageSize):
+    if manifest is not None:
+        #Manifest files list one document key per line
+        manifestBody = s3.get_object(Bucket=bucket, Key=manifest)['Body'].read().decode('utf-8')
+        keys = [line.strip() for line in manifestBody.splitlines() if line.strip() != ""]
+        start = int(position) if position is not None else 0
+        for pageStart in range(start, len(keys), pageSize):
+            pageEnd = min(pageStart + pageSize, len(keys))
+            yield keys[pageStart:pageEnd], (str(pageEnd) if pageEnd < len(keys) else None)
+        return
+
+    continuationToken = position
+    while True:
+        if continuationToken is None:
+            s3_result = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=pageSize)
+        else:
+            s3_result = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=pageSize, ContinuationToken=continuationToken)
+        keys = [key['Key'] for key in s3_result['Contents']] if 'Contents' in s3_result else []
+        continuationToken = s3_result['NextContinuationToken'] if s3_result['IsTruncated'] else None
+        yield keys, continuationToken
+        if continuationToken is None:
+            return
+
+#Function to read the checkpoint of a bulk submission from the tracking table
+def readBulkCheckpoint(dynamodb, table_name, bulkId):
+    response = dynamodb.get_item(
+        TableName=table_name,
+        Key={'JobId': {'S': bulkId}, 'JobType': {'S': 'BulkSubmit'}},
+        ConsistentRead=True
+    )
+    if 'Item' not in response:
+        return None
+    item = response['Item']
+    return {
+        'Position': item['Position']['S'] if 'Position' in item else None,
+        'Status': item['JobStatus']['S'],
+        'NumSubmitted': int(item['NumSubmitted']['N']),
+        'NumFailed': int(item['NumFailed']['N']),
+        'FailuresKey': item['FailuresKey']['S'] if 'FailuresKey' in item else None
+    }
+
+#Function to read the documents a bulk submission failed to submit, from the failures object of its checkpoint
+def readBulkFailures(s3, bucket, failuresKey):
+    if failuresKey is None:
+        return []
+    return json.loads(s3.get_object(Bucket=bucket, Key=failuresKey)['Body'].read())['FailedDocuments']
+
+#Function to write every document a bulk submission failed to submit so far, with the error it failed with, to S3
+#The keys are kept out of the checkpoint item, which would otherwise outgrow the DynamoDB item size limit
+def writeBulkFailures(s3, bucket, failuresKey, bulkId, failedDocuments):
+    s3.put_object(Bucket=bucket, Key=failuresKey, Body=json.dumps({'BulkId': bulkId, 'FailedDocuments': failedDocuments}, indent=4))
+
+#Function to record the position a bulk submission has reached, so that a later invocation can resume from it
+def writeBulkCheckpoint(dynamodb, table_name, bulkId, bucket, position, status, numSubmitted, numFailed, failuresKey=None):
+    item = {
+        'JobId': {'S': bulkId},
+        'JobType': {'S': 'BulkSubmit'},
+        'DocumentBucket': {'S': bucket},
+        'JobStatus': {'S': status},
+        'NumSubmitted': {'N': str(numSubmitted)},
+        'NumFailed': {'N': str(numFailed)},
+        'CheckpointTimeStamp': {'N': str(int(time.time()))}
+    }
+    if position is not None:
+        item['Position'] = {'S': position}
+    if failuresKey is not None:
+        item['FailuresKey'] = {'S': failuresKey}
+    dynamodb.put_item(TableName=table_name, Item=item)
+
+#Function to submit every document under a prefix, or listed in a manifest, with a bounded number of submissions in flight
+def submitBulk(bulk, settings, context):
+    s3 = getClient('s3')
+    textract = getClient('textract')
+    dynamodb = getClient('dynamodb')
+    table_name = settings['table_name']
+
+    bucket = bulk['Bucket']
+    prefix = bulk['Prefix'] if 'Prefix' in bulk else ""
+    manifest = bulk['Manifest'] if 'Manifest' in bulk else None
+    maxInFlight = int(bulk['MaxInFlight']) if 'MaxInFlight' in bulk else settings['max_inflight_submissions']
+    pageSize = int(bulk['PageSize']) if 'PageSize' in bulk else settings['bulk_page_size']
+    timeReserve = settings['bulk_time_reserve_ms']
+    bulkId = "BulkSubmit#{}/{}".format(bucket, manifest if manifest is not None else prefix)
+    bulkName = (manifest if manifest is not None else prefix).strip("/")
+    failuresKey = "{}/{}-failures.json".format(settings['bulk_failures_prefix'], bulkName if bulkName != "" else "bucket")
+
+    position = None
+    numSubmitted = 0
+    numFailed = 0
+    failedDocuments = []
+    checkpoint = readBulkCheckpoint(dynamodb, table_name, bulkId)
+    if checkpoint is not None and not ('Restart' in bulk and bulk['Restart']):
+        if checkpoint['Status'] == "COMPLETED":
+            print("Bulk submission {} already completed".format(bulkId))
+            result = {'BulkId': bulkId, 'Status': "COMPLETED", 'NumSubmitted': checkpoint['NumSubmitted'], 'NumFailed': checkpoint['NumFailed']}
+            if checkpoint['FailuresKey'] is not None:
+                result['FailuresKey'] = checkpoint['FailuresKey']
+            return result
+        position = checkpoint['Position']
+        numSubmitted = checkpoint['NumSubmitted']
+        numFailed = checkpoint['NumFailed']
+        #Failures of a page interrupted before its checkpoint are left out, the page is submitted again
+        failedDocuments = readBulkFailures(s3, bucket, checkpoint['FailuresKey'])[:numFailed]
+        print("Resuming bulk submission {} from {}, {} documents submitted so far".format(bulkId, position, numSubmitted))
+
+    governors = getSubmissionGovernors(settings, dynamodb)
+    def submit(document):
+        return document, submitDocument(bucket, document, settings, textract, dynamodb, governors)
+
+    status = "COMPLETED"
+    with ThreadPoolExecutor(max_workers=maxInFlight) as executor:
+        for keys, nextPosition in listBulkDocuments(s3, bucket, prefix, manifest, position, pageSize):
+            documents = [key for key in keys if key[key.rfind(".")+1:].upper() in SUPPORTED_DOCUMENT_TYPES]
+            print("Submitting {} of {} listed objects".format(len(documents), len(keys)))
+            pageFailed = numFailed
+            for document, response in executor.map(submit, documents):
+                if 'Error' in response or 'DocumentAnalysisJobId' not in response or 'TextDetectionJobId' not in response:
+                    numFailed += 1
+                    failedDocuments.append({'Key': document, 'Error': response['Error'] if 'Error' in response else "JobNotStarted"})
+                else:
+                    numSubmitted += 1
+            if numFailed > pageFailed:
+                writeBulkFailures(s3, bucket, failuresKey, bulkId, failedDocuments)
+
+            #Checkpoint once every document of the page has been submitted, resubmissions after a timeout are
+            #answered by Textract with the existing jobs, as the client request tokens are derived from the document
+            position = nextPosition
+            if position is None:
+                break
+            writeBulkCheckpoint(dynamodb, table_name, bulkId, bucket, position, "IN PROGRESS", numSubmitted, numFailed, failuresKey if numFailed > 0 else None)
+            if context is not None and context.get_remaining_time_in_millis() < timeReserve:
+                print("Stopping bulk submission {} at {} to stay within the time limit".format(bulkId, position))
+                status = "IN PROGRESS"
+                break
+
+    writeBulkCheckpoint(dynamodb, table_name, bulkId, bucket, position, status, numSubmitted, numFailed, failuresKey if numFailed > 0 else None)
+    print("Bulk submission {}: {} documents submitted, {} failed".format(bulkId, numSubmitted, numFailed))
+    result = {'BulkId': bulkId, 'Status': status, 'NumSubmitted': numSubmitted, 'NumFailed': numFailed, 'FailedDocuments': [failure['Key'] for failure in failedDocuments]}
+    if numFailed > 0:
+        result['FailuresKey'] = failuresKey
+    return result
+
 def lambda_handler(event, context): 
     print(event)
     
     #Initialize Boto Resource	
-    table_name=os.environ['table_name']
-    documentAnalysisTokenPrefix = os.environ['document_analysis_token_prefix']  
-    textDetectionTokenPrefix = os.environ['text_detection_token_prefix']  
-    roleArn = os.environ['role_arn']
-    documentAnalysisTopicArn = os.environ['document_analysis_topic_arn'] 
-    textDetectionTopicArn = os.environ['text_detection_topic_arn']
-
-    
-    retryInterval = int(os.environ['retry_interval']) #30
-    maxRetryAttempt = int(os.environ['max_retry_attempt']) #5
+    settings = {
+        'table_name': os.environ['table_name'],
+        'document_analysis_token_prefix': os.environ['document_analysis_token_prefix'],
+        'text_detection_token_prefix': os.environ['text_detection_token_prefix'],
+        'role_arn': os.environ['role_arn'],
+        'document_analysis_topic_arn': os.environ['document_analysis_topic_arn'],
+        'text_detection_topic_arn': os.environ['text_detection_topic_arn'],
+        'retry_interval': int(os.environ['retry_interval']), #30
+        'max_retry_attempt': int(os.environ['max_retry_attempt']), #5
+        'max_inflight_submissions': int(os.environ['max_inflight_submissions']) if 'max_inflight_submissions' in os.environ else 4,
+        'bulk_page_size': int(os.environ['bulk_page_size']) if 'bulk_page_size' in os.environ else 100,
+        'bulk_time_reserve_ms': int(os.environ['bulk_time_reserve_ms']) if 'bulk_time_reserve_ms' in os.environ else 60000,
+        'bulk_failures_prefix': os.environ['bulk_failures_prefix'] if 'bulk_failures_prefix' in os.environ else "bulk-failures"
+    }
     
     external_bucket = ""
     bucket = ""
@@ -382,9 +564,26 @@ def lambda_handler(event, context):
     if 'ExternalBucketName' in event:
         bucketAccessPolicyArn = attachExternalBucketPolicy(event['ExternalBucketName'])
         external_bucket = event['ExternalBucketName']
+
+    if 'BulkSubmit' in event:
+        jsonresponse = submitBulk(event['BulkSubmit'], settings, context)
+        if bucketAccessPolicyArn is not None and jsonresponse['Status'] == "COMPLETED":
+            detachExternalBucketPolicy(bucketAccessPolicyArn, event)
+        return jsonresponse
         
     if "Records" in event:        
-        record, = event["Records"]        
+        records = event["Records"]
+        if len(records) > 1:
+            #S3 notifications may batch several uploads, submit them all with one set of clients
+            textract = getClient('textract')
+            dynamodb = getClient('dynamodb')
+            governors = getSubmissionGovernors(settings, dynamodb)
+            jsonresponse = {'Documents': []}
+            for record in records:
+                print(record)
+                jsonresponse['Documents'].append(submitDocument(record['s3']['bucket']['name'], record['s3']['object']['key'], settings, textract, dynamodb, governors))
+            return jsonresponse
+        record, = records        
         print(record)
         bucket = record['s3']['bucket']['name']
         document = record['s3']['object']['key']
@@ -396,21 +595,7 @@ def lambda_handler(event, context):
         print("Bucket and/or Document not specified, nothing to do.")
         return {}
 
-    documentAnalysisResponse = submitDocumentAnalysisJob(bucket, document, 
-                                                        documentAnalysisTokenPrefix, 
-                                                        retryInterval, maxRetryAttempt, 
-                                                        documentAnalysisTopicArn, 
-                                                        roleArn, table_name)
-    print("DocumentAnalysisResponse = {}".format(documentAnalysisResponse))
-
-    textDetectionResponse = submitTextDetectionJob(bucket, document, 
-                                                    textDetectionTokenPrefix, 
-                                                    retryInterval, maxRetryAttempt, 
-                                                    textDetectionTopicArn, 
-                                                    roleArn, table_name)
-    print("TextDetectionResponse = {}".format(textDetectionResponse))
-        
-    jsonresponse = updateResponse(documentAnalysisResponse, textDetectionResponse, False)
+    jsonresponse = submitDocument(bucket, document, settings)
 
     if 'Error' in jsonresponse:
         return jsonresponse
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+#Function to index all blocks from textract response in a single pass, by id, parent, type and page
+#Block stores answer the same index from their stored arrays, without building it in memory
+def indexBlocks(responseBlocks):
+    if hasattr(responseBlocks, 'blockIndex'):
+        return responseBlocks.blockIndex()
+    index = {
+        'Blocks': {},
+        'Parents': defaultdict(list),
+        'Types': defaultdict(list),
+        'Pages': defaultdict(list)
+    }
+    for block in responseBlocks:
+        blockId = block['Id']
+        index['Blocks'][blockId] = block
+        index['Types'][block['BlockType']].append(blockId)
+        index['Pages'][block.get('Page', 1)].append(blockId)
+        if 'Relationships' in block.keys():
+            for relationship in block['Relationships']:
+                if relationship['Type'] == 'CHILD':
+                    for rid in relationship['Ids']:
+                        index['Parents'][rid].append(blockId)
+    return index
+
+#Function to find the parent of a block, optionally restricted to a given block type
+def findParent(index, blockId, blockType=None):
+    for parentId in index['Parents'].get(blockId, []):
+        if blockType is None or index['Blocks'][parentId]['BlockType'] == blockType:
+            return parentId
+    return None
+
+#Function to list child ids of a block for a given relationship type
+def childIds(block, relationshipType='CHILD'):
+    ids = []
+    if 'Relationships' in block.keys():
+        for relationship in block['Relationships']:
+            if relationship['Type'] == relationshipType:
+                ids.extend(relationship['Ids'])
+    return ids
+
+#Function to group all block elements from textract response by type
+def groupBlocksByType(responseBlocks):
+    blocks = {}
+
+    for block in responseBlocks:
+        blocktype = block['BlockType']
+        if blocktype not in blocks.keys():
+            blocks[blocktype] = [block]
+        else:
+            blocks[blocktype].append(block)
+    print("Extracted Block Types:")
+    for blocktype in blocks.keys():
+        print("                       {} = {}".format(blocktype, len(blocks[blocktype])))
+    return blocks
+
+#Function to copy the given fields of a block, where a field such as 'Geometry.BoundingBox' is read inside nested dictionaries
+#and kept under its last name, fields missing from the block are left out
+def pickFields(block, fields):
+    picked = {}
+    for field in fields:
+        value = block
+        for name in field.split('.'):
+            if name not in value:
+                break
+            value = value[name]
+        else:
+            picked[field[field.rfind('.')+1:]] = value
+    return picked
+
+#Extractors are fed by a dispatcher with the blocks of the types they declare, each extractor keeps what it needs of a block
+#    blockTypes: types of the blocks dispatched to the extractor
+class BlockExtractor(object):
+    blockTypes = ()
+
+    def __init__(self):
+        self.reset()
+
+    #Forget the blocks visited so far, before the blocks of another page or document are dispatched
+    def reset(self):
+        pass
+
+    def visit(self, block):
+        pass
+
+    def result(self):
+        return None
+
+#Dispatcher visiting each block of a response once, and handing it to every registered extractor of its type
+#Only the text function registers several extractors, for its text and spatial index, the table and form functions
+#each register their own, so tables and form fields of the same response still take one traversal per function
+class BlockDispatcher(object):
+
+    def __init__(self, extractors=None):
+        self.extractors = []
+        self.visitors = {}
+        self.counts = {}
+        for extractor in extractors or []:
+            self.register(extractor)
+
+    def register(self, extractor):
+        self.extractors.append(extractor)
+        for blockType in extractor.blockTypes:
+            self.visitors[blockType] = self.visitors.get(blockType, ()) + (extractor.visit,)
+        return extractor
+
+    def reset(self):
+        self.counts = {}
+        for extractor in self.extractors:
+            extractor.reset()
+
+    def dispatch(self, blocks):
+        visitors = self.visitors
+        counts = self.counts
+        for block in blocks:
+            blockType = block['BlockType']
+            counts[blockType] = counts.get(blockType, 0) + 1
+            for visit in visitors.get(blockType, ()):
+                visit(block)
+
+    #Print the number of blocks of each type dispatched since the last reset, as groupBlocksByType does
+    def printCounts(self):
+        counts = self.counts
+        print("Extracted Block Types:")
+        for blockType in counts.keys():
+            print("                       {} = {}".format(blockType, counts[blockType]))
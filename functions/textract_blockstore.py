@@ -0,0 +1,448 @@
+import sys
+import json
+import zlib
+import mmap
+import array
+import struct
+from collections.abc import Mapping, Sequence
+
+#Compact columnar representation of a Textract response
+#
+#Block types, entity types and relationship types are stored as small integers, ids are interned
+#into a single string table, confidence and geometry are kept in contiguous double precision arrays,
+#so that they read back exactly as parsed, and relationships as offset arrays. The file is laid out as a fixed header, a table of sections and the sections
+#themselves, so that it can be memory mapped and read without being parsed.
+
+MAGIC = b'TXBS'
+VERSION = 2
+HEADER = struct.Struct('<4sIIII')
+SECTION = struct.Struct('<QQ')
+
+FLAG_TEXT = 1
+FLAG_CONFIDENCE = 2
+FLAG_GEOMETRY = 4
+FLAG_CELL = 8
+
+NO_BLOCK = 0xFFFFFFFF
+
+#Sections in file order, with the array typecode of their elements
+SECTIONS = [
+    ('meta', 'B'),
+    ('types', 'B'),
+    ('flags', 'B'),
+    ('entityTypes', 'B'),
+    ('textTypes', 'B'),
+    ('selectionStatus', 'B'),
+    ('pages', 'I'),
+    ('idIndex', 'I'),
+    ('confidence', 'd'),
+    ('boundingBox', 'd'),
+    ('polygonOffsets', 'I'),
+    ('polygon', 'd'),
+    ('textOffsets', 'I'),
+    ('text', 'B'),
+    ('cell', 'I'),
+    ('relationshipOffsets', 'I'),
+    ('relationshipTypes', 'B'),
+    ('relationshipIdOffsets', 'I'),
+    ('relationshipIds', 'I'),
+    ('idOffsets', 'I'),
+    ('ids', 'B'),
+    ('idHash', 'I'),
+    ('blockOfId', 'I'),
+    ('parentOffsets', 'I'),
+    ('parents', 'I'),
+    ('typeOrder', 'I'),
+    ('typeOffsets', 'I'),
+    ('pageOrder', 'I'),
+    ('pageNumbers', 'I'),
+    ('pageOffsets', 'I')
+]
+
+#Function to look up the small integer code of a value, adding it to the code table when first seen
+def _code(codes, table, value):
+    if value not in codes:
+        codes[value] = len(table)
+        table.append(value)
+    return codes[value]
+
+#Function to write blocks, streamed from a Textract response, to a block store file
+def writeBlockStore(blocks, path):
+    meta = {'BlockTypes': [], 'RelationshipTypes': [], 'EntityTypes': [], 'TextTypes': [None], 'SelectionStatuses': [None]}
+    codes = dict((name, dict((value, i) for i, value in enumerate(table))) for name, table in meta.items())
+    columns = dict((name, array.array(typecode)) for name, typecode in SECTIONS)
+    columns['polygonOffsets'].append(0)
+    columns['textOffsets'].append(0)
+    columns['relationshipOffsets'].append(0)
+    columns['relationshipIdOffsets'].append(0)
+    ids = {}
+    idList = []
+    text = bytearray()
+
+    numBlocks = 0
+    for block in blocks:
+        columns['types'].append(_code(codes['BlockTypes'], meta['BlockTypes'], block['BlockType']))
+        #Blocks of single page responses carry no page, they belong to the first one
+        columns['pages'].append(block.get('Page', 1))
+        columns['idIndex'].append(_code(ids, idList, block['Id']))
+        flags = 0
+
+        entityTypes = 0
+        for entityType in block.get('EntityTypes', []):
+            entityTypes |= 1 << _code(codes['EntityTypes'], meta['EntityTypes'], entityType)
+        columns['entityTypes'].append(entityTypes)
+        columns['textTypes'].append(_code(codes['TextTypes'], meta['TextTypes'], block.get('TextType')))
+        columns['selectionStatus'].append(_code(codes['SelectionStatuses'], meta['SelectionStatuses'], block.get('SelectionStatus')))
+
+        if 'Confidence' in block:
+            flags |= FLAG_CONFIDENCE
+            columns['confidence'].append(block['Confidence'])
+        else:
+            columns['confidence'].append(0.0)
+
+        if 'Geometry' in block:
+            flags |= FLAG_GEOMETRY
+            boundingBox = block['Geometry']['BoundingBox']
+            columns['boundingBox'].extend([boundingBox['Left'], boundingBox['Top'], boundingBox['Width'], boundingBox['Height']])
+            for point in block['Geometry'].get('Polygon', []):
+                columns['polygon'].extend([point['X'], point['Y']])
+        else:
+            columns['boundingBox'].extend([0.0, 0.0, 0.0, 0.0])
+        columns['polygonOffsets'].append(len(columns['polygon']) // 2)
+
+        if 'Text' in block:
+            flags |= FLAG_TEXT
+            text.extend(block['Text'].encode('utf-8'))
+        columns['textOffsets'].append(len(text))
+
+        if 'RowIndex' in block:
+            flags |= FLAG_CELL
+            columns['cell'].extend([block['RowIndex'], block['ColumnIndex'], block.get('RowSpan', 1), block.get('ColumnSpan', 1)])
+        else:
+            columns['cell'].extend([0, 0, 0, 0])
+
+        for relationship in block.get('Relationships', []):
+            columns['relationshipTypes'].append(_code(codes['RelationshipTypes'], meta['RelationshipTypes'], relationship['Type']))
+            for rid in relationship['Ids']:
+                columns['relationshipIds'].append(_code(ids, idList, rid))
+            columns['relationshipIdOffsets'].append(len(columns['relationshipIds']))
+        columns['relationshipOffsets'].append(len(columns['relationshipTypes']))
+
+        columns['flags'].append(flags)
+        numBlocks += 1
+
+    columns['text'] = array.array('B', bytes(text))
+
+    #Intern the ids into one string table, with an open addressing hash table for lookups by id
+    idBytes = bytearray()
+    columns['idOffsets'].append(0)
+    hashSize = 1
+    while hashSize < 2 * len(idList):
+        hashSize *= 2
+    columns['idHash'] = array.array('I', [0]) * hashSize
+    for idIndex, rid in enumerate(idList):
+        encodedId = rid.encode('utf-8')
+        idBytes.extend(encodedId)
+        columns['idOffsets'].append(len(idBytes))
+        slot = zlib.crc32(encodedId) & (hashSize - 1)
+        while columns['idHash'][slot] != 0:
+            slot = (slot + 1) & (hashSize - 1)
+        columns['idHash'][slot] = idIndex + 1
+    columns['ids'] = array.array('B', bytes(idBytes))
+    del ids
+
+    columns['blockOfId'] = array.array('I', [NO_BLOCK]) * len(idList)
+    for i in range(numBlocks):
+        columns['blockOfId'][columns['idIndex'][i]] = i
+
+    #Child to parent relationships, as offsets into a list of parent block indices
+    childType = codes['RelationshipTypes'].get('CHILD')
+    def childBlocks(i):
+        for g in range(columns['relationshipOffsets'][i], columns['relationshipOffsets'][i+1]):
+            if columns['relationshipTypes'][g] == childType:
+                for r in range(columns['relationshipIdOffsets'][g], columns['relationshipIdOffsets'][g+1]):
+                    child = columns['blockOfId'][columns['relationshipIds'][r]]
+                    if child != NO_BLOCK:
+                        yield child
+    columns['parentOffsets'] = array.array('I', [0]) * (numBlocks + 1)
+    for i in range(numBlocks):
+        for child in childBlocks(i):
+            columns['parentOffsets'][child + 1] += 1
+    for i in range(numBlocks):
+        columns['parentOffsets'][i + 1] += columns['parentOffsets'][i]
+    columns['parents'] = array.array('I', [0]) * columns['parentOffsets'][numBlocks]
+    filled = array.array('I', [0]) * numBlocks
+    for i in range(numBlocks):
+        for child in childBlocks(i):
+            columns['parents'][columns['parentOffsets'][child] + filled[child]] = i
+            filled[child] += 1
+    del filled
+
+    #Block indices grouped by type and by page, in block order within each group
+    columns['typeOrder'] = array.array('I', sorted(range(numBlocks), key=columns['types'].__getitem__))
+    columns['typeOffsets'] = array.array('I', [0] * (len(meta['BlockTypes']) + 1))
+    for blockType in columns['types']:
+        columns['typeOffsets'][blockType + 1] += 1
+    for t in range(len(meta['BlockTypes'])):
+        columns['typeOffsets'][t + 1] += columns['typeOffsets'][t]
+    columns['pageOrder'] = array.array('I', sorted(range(numBlocks), key=columns['pages'].__getitem__))
+    columns['pageNumbers'] = array.array('I', sorted(set(columns['pages'])))
+    columns['pageOffsets'].append(0)
+    for pageNumber in columns['pageNumbers']:
+        columns['pageOffsets'].append(columns['pageOffsets'][-1])
+    pagePositions = dict((pageNumber, p) for p, pageNumber in enumerate(columns['pageNumbers']))
+    for pageNumber in columns['pages']:
+        columns['pageOffsets'][pagePositions[pageNumber] + 1] += 1
+    for p in range(len(columns['pageNumbers'])):
+        columns['pageOffsets'][p + 1] += columns['pageOffsets'][p]
+
+    meta['ByteOrder'] = sys.byteorder
+    columns['meta'] = array.array('B', json.dumps(meta).encode('utf-8'))
+
+    with open(path, 'wb') as storeFile:
+        offset = HEADER.size + SECTION.size * len(SECTIONS)
+        storeFile.write(HEADER.pack(MAGIC, VERSION, numBlocks, len(idList), len(SECTIONS)))
+        layout = []
+        for name, typecode in SECTIONS:
+            offset += (-offset) % 8
+            length = len(columns[name]) * columns[name].itemsize
+            layout.append((offset, length))
+            storeFile.write(SECTION.pack(offset, length))
+            offset += length
+        for (name, typecode), (offset, length) in zip(SECTIONS, layout):
+            storeFile.write(b'\0' * (offset - storeFile.tell()))
+            columns[name].tofile(storeFile)
+    return numBlocks
+
+#Function to download a block store from S3 to local storage, and open it memory mapped
+def downloadBlockStore(s3client, bucket, key, path):
+    s3client.download_file(bucket, key, path)
+    return BlockStore(path)
+
+#Memory mapped block store, iterating as read-only Textract blocks
+class BlockStore(Sequence):
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, self.numBlocks, self.numIds, numSections = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} block store".format(path, VERSION))
+        for s, (name, typecode) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self._mmap, HEADER.size + SECTION.size * s)
+            setattr(self, '_' + name, view[offset:offset + length].cast(typecode))
+        self.meta = json.loads(bytes(self._meta).decode('utf-8'))
+        if self.meta['ByteOrder'] != sys.byteorder:
+            raise ValueError("{} was written on a {} endian machine".format(path, self.meta['ByteOrder']))
+        self._typeCodes = dict((blockType, t) for t, blockType in enumerate(self.meta['BlockTypes']))
+
+    def close(self):
+        for name, typecode in SECTIONS:
+            getattr(self, '_' + name).release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.numBlocks
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.numBlocks
+        if i < 0 or i >= self.numBlocks:
+            raise IndexError(i)
+        return BlockView(self, i)
+
+    def __iter__(self):
+        for i in range(self.numBlocks):
+            yield BlockView(self, i)
+
+    def idAt(self, idIndex):
+        return bytes(self._ids[self._idOffsets[idIndex]:self._idOffsets[idIndex+1]]).decode('utf-8')
+
+    def blockId(self, i):
+        return self.idAt(self._idIndex[i])
+
+    #Probe the stored hash table of ids, returns the block index or None
+    def findBlock(self, blockId):
+        target = blockId.encode('utf-8')
+        mask = len(self._idHash) - 1
+        slot = zlib.crc32(target) & mask
+        while self._idHash[slot] != 0:
+            idIndex = self._idHash[slot] - 1
+            if self._ids[self._idOffsets[idIndex]:self._idOffsets[idIndex+1]] == target:
+                block = self._blockOfId[idIndex]
+                return None if block == NO_BLOCK else block
+            slot = (slot + 1) & mask
+        return None
+
+    def blocksOfType(self, blockType):
+        if blockType not in self._typeCodes:
+            return []
+        t = self._typeCodes[blockType]
+        return self._typeOrder[self._typeOffsets[t]:self._typeOffsets[t+1]]
+
+    def blocksOfPage(self, pageNumber):
+        for p, number in enumerate(self._pageNumbers):
+            if number == pageNumber:
+                return self._pageOrder[self._pageOffsets[p]:self._pageOffsets[p+1]]
+        return []
+
+    def parentsOf(self, i):
+        return self._parents[self._parentOffsets[i]:self._parentOffsets[i+1]]
+
+    #Function to provide the same index as textract_util.indexBlocks, answered from the stored arrays
+    def blockIndex(self):
+        return {
+            'Blocks': _StoreBlocks(self),
+            'Parents': _StoreParents(self),
+            'Types': _StoreIdGroups(self, self.meta['BlockTypes'], self.blocksOfType),
+            'Pages': _StoreIdGroups(self, [number for number in self._pageNumbers], self.blocksOfPage)
+        }
+
+#Read-only view of one stored block, behaving like the block dictionary from the Textract response
+class BlockView(Mapping):
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def _has(self, key):
+        store = self.store
+        i = self.index
+        if key in ('Id', 'BlockType', 'Page'):
+            return True
+        if key == 'Confidence':
+            return bool(store._flags[i] & FLAG_CONFIDENCE)
+        if key == 'Geometry':
+            return bool(store._flags[i] & FLAG_GEOMETRY)
+        if key == 'Text':
+            return bool(store._flags[i] & FLAG_TEXT)
+        if key in ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan'):
+            return bool(store._flags[i] & FLAG_CELL)
+        if key == 'EntityTypes':
+            return store._entityTypes[i] != 0
+        if key == 'TextType':
+            return store._textTypes[i] != 0
+        if key == 'SelectionStatus':
+            return store._selectionStatus[i] != 0
+        if key == 'Relationships':
+            return store._relationshipOffsets[i] != store._relationshipOffsets[i+1]
+        return False
+
+    def __contains__(self, key):
+        return self._has(key)
+
+    def __getitem__(self, key):
+        if not self._has(key):
+            raise KeyError(key)
+        store = self.store
+        i = self.index
+        if key == 'Id':
+            return store.blockId(i)
+        if key == 'BlockType':
+            return store.meta['BlockTypes'][store._types[i]]
+        if key == 'Page':
+            return store._pages[i]
+        if key == 'Confidence':
+            return store._confidence[i]
+        if key == 'Text':
+            return bytes(store._text[store._textOffsets[i]:store._textOffsets[i+1]]).decode('utf-8')
+        if key == 'Geometry':
+            left, top, width, height = store._boundingBox[4*i:4*i+4]
+            polygon = store._polygon[2*store._polygonOffsets[i]:2*store._polygonOffsets[i+1]]
+            return {
+                'BoundingBox': {'Width': width, 'Height': height, 'Left': left, 'Top': top},
+                'Polygon': [{'X': polygon[p], 'Y': polygon[p+1]} for p in range(0, len(polygon), 2)]
+            }
+        if key in ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan'):
+            return store._cell[4*i + ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan').index(key)]
+        if key == 'EntityTypes':
+            return [entityType for e, entityType in enumerate(store.meta['EntityTypes']) if store._entityTypes[i] & (1 << e)]
+        if key == 'TextType':
+            return store.meta['TextTypes'][store._textTypes[i]]
+        if key == 'SelectionStatus':
+            return store.meta['SelectionStatuses'][store._selectionStatus[i]]
+        if key == 'Relationships':
+            relationships = []
+            for g in range(store._relationshipOffsets[i], store._relationshipOffsets[i+1]):
+                relationships.append({
+                    'Type': store.meta['RelationshipTypes'][store._relationshipTypes[g]],
+                    'Ids': [store.idAt(r) for r in store._relationshipIds[store._relationshipIdOffsets[g]:store._relationshipIdOffsets[g+1]]]
+                })
+            return relationships
+
+    def __iter__(self):
+        for key in ('BlockType', 'Confidence', 'Text', 'TextType', 'RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan',
+                    'Geometry', 'Id', 'Relationships', 'EntityTypes', 'SelectionStatus', 'Page'):
+            if self._has(key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+class _StoreBlocks(Mapping):
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, blockId):
+        i = self.store.findBlock(blockId)
+        if i is None:
+            raise KeyError(blockId)
+        return BlockView(self.store, i)
+
+    def __contains__(self, blockId):
+        return self.store.findBlock(blockId) is not None
+
+    def __iter__(self):
+        for i in range(self.store.numBlocks):
+            yield self.store.blockId(i)
+
+    def __len__(self):
+        return self.store.numBlocks
+
+class _StoreParents(Mapping):
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, blockId):
+        i = self.store.findBlock(blockId)
+        if i is None or len(self.store.parentsOf(i)) == 0:
+            raise KeyError(blockId)
+        return [self.store.blockId(parent) for parent in self.store.parentsOf(i)]
+
+    def __iter__(self):
+        for i in range(self.store.numBlocks):
+            if len(self.store.parentsOf(i)) > 0:
+                yield self.store.blockId(i)
+
+    def __len__(self):
+        return sum(1 for blockId in self)
+
+class _StoreIdGroups(Mapping):
+
+    def __init__(self, store, keys, blocksOf):
+        self.store = store
+        self.keys_ = keys
+        self.blocksOf = blocksOf
+
+    def __getitem__(self, key):
+        if key not in self.keys_:
+            raise KeyError(key)
+        return [self.store.blockId(i) for i in self.blocksOf(key)]
+
+    def __iter__(self):
+        return iter(self.keys_)
+
+    def __len__(self):
+        return len(self.keys_)
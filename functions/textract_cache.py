@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+#Least recently used cache of assembled results, held in module scope so that it survives across warm invocations
+#Every entry carries the version it was built from, and is only served while the job still has that version
+class ResultCache(object):
+
+    def __init__(self, maxEntries, maxBytes):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.numBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key):
+        version, value, size = self.entries.pop(key)
+        self.numBytes -= size
+
+    #Return the cached value for the key if it was built from the given version, otherwise None
+    def get(self, key, version):
+        with self.lock:
+            if key in self.entries:
+                if self.entries[key][0] == version:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return self.entries[key][1]
+                self._remove(key)
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    #Add a value of approximately the given size in bytes, evicting the least recently used entries to make room
+    def put(self, key, version, value, size):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if self.maxEntries <= 0 or size > self.maxBytes:
+                return False
+            self.entries[key] = (version, value, size)
+            self.numBytes += size
+            while len(self.entries) > self.maxEntries or self.numBytes > self.maxBytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                'Hits': self.hits,
+                'Misses': self.misses,
+                'Stale': self.stale,
+                'Evictions': self.evictions,
+                'Entries': len(self.entries),
+                'Bytes': self.numBytes
+            }
+
+_resultCache = None
+_resultCacheLock = threading.Lock()
+
+#Function to get the result cache of this container, sized by environment variables
+#    result_cache_entries: maximum number of results kept (64 by default, 0 disables the cache)
+#    result_cache_bytes: maximum total size of the files the results were read from (64 MB by default)
+def getResultCache():
+    global _resultCache
+    with _resultCacheLock:
+        if _resultCache is None:
+            maxEntries = int(os.environ['result_cache_entries']) if 'result_cache_entries' in os.environ else 64
+            maxBytes = int(os.environ['result_cache_bytes']) if 'result_cache_bytes' in os.environ else 64 * 1024 * 1024
+            _resultCache = ResultCache(maxEntries, maxBytes)
+        return _resultCache
+
+#Function to read the ETags of several result objects concurrently
+def getObjectETags(s3client, bucket, keys, maxWorkers=16):
+    def head(key):
+        return s3client.head_object(Bucket=bucket, Key=key)['ETag']
+
+    if len(keys) <= 1:
+        return [head(key) for key in keys]
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(keys))) as executor:
+        return list(executor.map(head, keys))
+
+#Function to compute the version a cached result is validated against, None for jobs still in progress
+#The result_cache_validation environment variable selects what the version is made of
+#    timestamp (default): the job completion time and the result files recorded for the job
+#    etag: the ETags of the result files, read from S3, for results that may be rewritten in place
+def getResultVersion(s3client, bucket, item, files):
+    if item['JobCompleteTimeStamp'] <= item['JobStartTimeStamp']:
+        return None
+    validation = os.environ['result_cache_validation'] if 'result_cache_validation' in os.environ else "timestamp"
+    if validation == "etag":
+        return tuple(getObjectETags(s3client, bucket, files))
+    return (str(item['JobCompleteTimeStamp']), tuple(files))
+
+#Function to compute the version tag of a job result, from the job, its completion time and its result files
+#The variant tells apart the different responses assembled from the same files
+def getResultETag(jobId, completeTimeStamp, files, variant=""):
+    tag = json.dumps([jobId, str(completeTimeStamp), variant, list(files)])
+    return hashlib.sha1(tag.encode('utf-8')).hexdigest()
+
+#Function to check a tag against the value of an If-None-Match parameter, which may list several tags, quoted or weak, or be *
+def matchesETag(ifNoneMatch, etag):
+    if ifNoneMatch is None or ifNoneMatch.strip() == "":
+        return False
+    for candidate in ifNoneMatch.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == '*' or candidate == etag:
+            return True
+    return False
@@ -0,0 +1,26 @@
+import threading
+import boto3
+from botocore.config import Config
+
+_clients = {}
+_clientsLock = threading.Lock()
+
+#Function to get a client shared by all invocations served by this container, created on first use
+#Clients are keyed by service and connection pool size, so that handlers reading or writing concurrently get a pool large enough
+def getClient(service, maxPoolConnections=None):
+    key = ('client', service, maxPoolConnections)
+    with _clientsLock:
+        if key not in _clients:
+            if maxPoolConnections is None:
+                _clients[key] = boto3.client(service)
+            else:
+                _clients[key] = boto3.client(service, config=Config(max_pool_connections=maxPoolConnections))
+        return _clients[key]
+
+#Function to get a resource shared by all invocations served by this container, created on first use
+def getResource(service):
+    key = ('resource', service)
+    with _clientsLock:
+        if key not in _clients:
+            _clients[key] = boto3.resource(service)
+        return _clients[key]
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from textract_blocks import BlockExtractor, pickFields
+
+#Function to extract all key value pair blocks from textract response
+def extractKeyValuePairs(blocks):
+
+    formKeys = {}
+    formValues = {}
+    
+    if 'KEY_VALUE_SET' in blocks:
+        keyValuePairs = blocks['KEY_VALUE_SET']
+
+        for pair in keyValuePairs:
+                                            
+            if pair['EntityTypes'][0] == 'KEY':
+                
+                if pair["Id"] not in formKeys.keys():
+                    formKeys[pair["Id"]] = {
+                                                "BoundingBox": pair["Geometry"]["BoundingBox"],
+                                                "Polygon": pair["Geometry"]["Polygon"]
+                                            }
+                else:
+                    formKeys[pair["Id"]]["BoundingBox"] = pair["Geometry"]["BoundingBox"]               
+                    formKeys[pair["Id"]]["Polygon"] = pair["Geometry"]["Polygon"]
+                    
+                for relationShip in pair['Relationships']:
+                    if relationShip['Type'] == "CHILD":
+                        if pair["Id"] not in formKeys.keys():
+                            formKeys[pair["Id"]] = {"CHILD": relationShip["Ids"]}
+                        else:
+                            formKeys[pair["Id"]]["CHILD"] = relationShip["Ids"]
+                    elif relationShip['Type'] == "VALUE":
+                        if pair["Id"] not in formKeys.keys():
+                            formKeys[pair["Id"]] = {"VALUE": relationShip["Ids"][0]}
+                        else:
+                            formKeys[pair["Id"]]["VALUE"] = relationShip["Ids"][0]                    
+            elif pair['EntityTypes'][0] == 'VALUE':
+                
+                if pair["Id"] not in formKeys.keys():
+                    formValues[pair["Id"]] = {
+                                                "BoundingBox": pair["Geometry"]["BoundingBox"],
+                                                "Polygon": pair["Geometry"]["Polygon"]
+                                            }
+                else:
+                    formValues[pair["Id"]]["BoundingBox"] = pair["Geometry"]["BoundingBox"]               
+                    formValues[pair["Id"]]["Polygon"] = pair["Geometry"]["Polygon"]
+                    
+                if pair["Id"] not in formValues.keys():
+                    formValues[pair["Id"]] = {}
+                if "Relationships" in pair.keys():
+                    for relationShip in pair['Relationships']:
+                        if relationShip['Type'] == "CHILD":
+                            if pair["Id"] not in formValues.keys():
+                                formValues[pair["Id"]] = {"CHILD": relationShip["Ids"]}
+                            else:
+                                formValues[pair["Id"]]["CHILD"] = relationShip["Ids"]                    
+
+    return formKeys, formValues
+
+#Function to extract all words from textract response
+def extractWords(blocks):
+    
+    pageWords = {}
+    if 'WORD' in blocks:
+        wordBlocks = blocks['WORD']
+        for wordBlock in wordBlocks:   
+            
+            if wordBlock["Id"] not in pageWords.keys():
+                pageWords[wordBlock["Id"]] = {
+                                                "Text": wordBlock["Text"], 
+                                                "BoundingBox": wordBlock["Geometry"]["BoundingBox"],
+                                                "Polygon": wordBlock["Geometry"]["Polygon"]
+                                            }
+            else:
+                pageWords[wordBlock["Id"]]["Text"] = wordBlock["Text"]        
+                pageWords[wordBlock["Id"]]["BoundingBox"] = wordBlock["Geometry"]["BoundingBox"]
+                pageWords[wordBlock["Id"]]["Polygon"] = wordBlock["Geometry"]["Polygon"]
+    return pageWords
+
+#Function to join the text of the given words, skipping words missing from the response
+#The text starts with a space, as the form entries always did
+def joinWordText(wordIds, pageWords):
+    texts = [pageWords[wordId]["Text"] for wordId in wordIds if wordId in pageWords]
+    return " " + " ".join(texts) if texts else ""
+
+#Function to assemble the form fields in a single pass over the keys, ordered by page and by position in the response
+#Keys without a value, and words missing from the response, give an empty value instead of failing the whole job
+#    confidence: add the confidence of the key and value blocks, geometry: add their bounding box and polygon
+#    order: "response" (default) keeps the order of the keys in the response within a page, "position" sorts them in
+#    reading order of their bounding boxes
+def generateFormFields(formKeys, formValues, pageWords, confidence=False, geometry=False, order="response"):
+    formFields = []
+    keyBoxes = []
+    for formKey in formKeys.values():
+        keyText = joinWordText(formKey.get("CHILD", []), pageWords)
+        if keyText == "":
+            continue
+        formValue = formValues.get(formKey.get("VALUE"), {})
+        field = {"Key": keyText, "Value": joinWordText(formValue.get("CHILD", []), pageWords), "Page": formKey.get("Page", 1)}
+        if confidence:
+            field["KeyConfidence"] = formKey.get("Confidence")
+            field["ValueConfidence"] = formValue.get("Confidence")
+        if geometry:
+            field["KeyBoundingBox"] = formKey.get("BoundingBox")
+            field["KeyPolygon"] = formKey.get("Polygon")
+            field["ValueBoundingBox"] = formValue.get("BoundingBox")
+            field["ValuePolygon"] = formValue.get("Polygon")
+        formFields.append(field)
+        keyBoxes.append(formKey.get("BoundingBox"))
+    if order == "position":
+        return orderFieldsByPosition(formFields, keyBoxes)
+    #Sorting is stable, fields of the same page keep their order in the response
+    formFields.sort(key=lambda field: field["Page"])
+    return formFields
+
+#Function to order form fields by page, then in reading order of the bounding boxes of their keys
+#Pages with keys missing their bounding box keep the order of the response
+def orderFieldsByPosition(formFields, keyBoxes):
+    from textract_geometry import boxArray, readingOrder
+    pages = OrderedDict()
+    for field, keyBox in zip(formFields, keyBoxes):
+        pages.setdefault(field["Page"], []).append((field, keyBox))
+    orderedFields = []
+    for page in sorted(pages.keys()):
+        pageFields = pages[page]
+        if any([keyBox is None for field, keyBox in pageFields]):
+            orderedFields.extend([field for field, keyBox in pageFields])
+        else:
+            orderedFields.extend([pageFields[i][0] for i in readingOrder(boxArray([keyBox for field, keyBox in pageFields]))])
+    return orderedFields
+
+#Function to group form fields by key text, keys appear in the order of their first field
+def formFieldsToEntries(formFields):
+    formEntries = OrderedDict()
+    for field in formFields:
+        if field["Key"] not in formEntries:
+            formEntries[field["Key"]] = [field["Value"]]
+        else:
+            formEntries[field["Key"]].append(field["Value"])
+    return formEntries
+
+#Function to create a dictionary JSON containing the key value pairs as identified by parsing the textract response
+def generateFormEntries(formKeys, formValues, pageWords):
+    return formFieldsToEntries(generateFormFields(formKeys, formValues, pageWords))
+
+#Extractor of the form fields of the blocks dispatched to it, replacing groupBlocksByType, extractKeyValuePairs and extractWords
+#Only the text of the words is kept, along with the confidence and geometry of the keys and values when asked for,
+#and the bounding boxes of the keys when the fields are ordered by position
+class FormExtractor(BlockExtractor):
+    blockTypes = ('KEY_VALUE_SET', 'WORD')
+
+    def __init__(self, confidence=False, geometry=False, order="response"):
+        self.confidence = confidence
+        self.geometry = geometry
+        self.order = order
+        self.pairFields = ('Page',) + (('Confidence',) if confidence else ())
+        if geometry:
+            self.pairFields += ('Geometry.BoundingBox', 'Geometry.Polygon')
+        elif order == "position":
+            self.pairFields += ('Geometry.BoundingBox',)
+        BlockExtractor.__init__(self)
+
+    def reset(self):
+        self.formKeys = {}
+        self.formValues = {}
+        self.pageWords = {}
+
+    def visit(self, block):
+        if block['BlockType'] == 'WORD':
+            self.pageWords[block['Id']] = {'Text': block['Text']}
+            return
+        entityType = block['EntityTypes'][0]
+        if entityType == 'KEY':
+            entry = pickFields(block, self.pairFields)
+            for relationShip in block.get('Relationships', []):
+                if relationShip['Type'] == "CHILD":
+                    entry['CHILD'] = relationShip['Ids']
+                elif relationShip['Type'] == "VALUE":
+                    entry['VALUE'] = relationShip['Ids'][0]
+            self.formKeys[block['Id']] = entry
+        elif entityType == 'VALUE':
+            entry = pickFields(block, self.pairFields)
+            for relationShip in block.get('Relationships', []):
+                if relationShip['Type'] == "CHILD":
+                    entry['CHILD'] = relationShip['Ids']
+            self.formValues[block['Id']] = entry
+
+    #Form fields of the visited blocks, with the confidence and geometry the extractor keeps
+    def formFields(self):
+        return generateFormFields(self.formKeys, self.formValues, self.pageWords, self.confidence, self.geometry, self.order)
+
+    def result(self):
+        return formFieldsToEntries(self.formFields())
+
+#Extractor of the words of the blocks dispatched to it, by id, keeping only the given fields of each word
+class WordExtractor(BlockExtractor):
+    blockTypes = ('WORD',)
+
+    def __init__(self, fields=('Text',)):
+        self.wordFields = tuple(fields)
+        BlockExtractor.__init__(self)
+
+    def reset(self):
+        self.pageWords = {}
+
+    def visit(self, block):
+        self.pageWords[block['Id']] = pickFields(block, self.wordFields)
+
+    def result(self):
+        return self.pageWords
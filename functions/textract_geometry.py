@@ -0,0 +1,160 @@
+import math
+
+#NumPy is optional, it is not part of the Lambda runtime and is only used when deployed along with the functions,
+#every function gives the same result from plain Python lists without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+HAS_NUMPY = numpy is not None
+
+#Largest number of item and container pairs compared at once, bounding the memory of the vectorized overlap tests
+MAX_PAIRS = 1 << 20
+
+#Relative tolerance of the overlap tests, so that boxes lying exactly within their container pass a full containment test
+#despite the rounding of their edges
+OVERLAP_TOLERANCE = 1e-9
+
+#Bounding boxes of a set of blocks, held as columns of left, top, right and bottom edges
+#The columns are NumPy arrays when vectorized, lists otherwise
+class BoxArray(object):
+
+    def __init__(self, left, top, right, bottom, vectorized=None):
+        if vectorized is None:
+            vectorized = HAS_NUMPY
+        if vectorized and not HAS_NUMPY:
+            raise ValueError("NumPy is not available for vectorized geometry")
+        self.vectorized = vectorized
+        if vectorized:
+            self.left = numpy.asarray(left, dtype=numpy.float64)
+            self.top = numpy.asarray(top, dtype=numpy.float64)
+            self.right = numpy.asarray(right, dtype=numpy.float64)
+            self.bottom = numpy.asarray(bottom, dtype=numpy.float64)
+        else:
+            self.left = list(left)
+            self.top = list(top)
+            self.right = list(right)
+            self.bottom = list(bottom)
+
+    def __len__(self):
+        return len(self.left)
+
+#Function to load the Textract bounding boxes of a page, given as dictionaries of Left, Top, Width and Height, into a BoxArray
+def boxArray(boundingBoxes, vectorized=None):
+    left = [box['Left'] for box in boundingBoxes]
+    top = [box['Top'] for box in boundingBoxes]
+    right = [box['Left'] + box['Width'] for box in boundingBoxes]
+    bottom = [box['Top'] + box['Height'] for box in boundingBoxes]
+    return BoxArray(left, top, right, bottom, vectorized)
+
+#Function to assign each item box to the container box covering the largest share of its area
+#Returns, for each item, the index of its container, or -1 when no container covers at least minOverlap of its area
+#With minOverlap set to 1.0 the items must lie entirely within their container, ties go to the first container
+def assignBoxes(items, containers, minOverlap=0.5):
+    if len(items) == 0:
+        return []
+    if len(containers) == 0:
+        return [-1] * len(items)
+    if items.vectorized and containers.vectorized:
+        return _assignBoxesVectorized(items, containers, minOverlap)
+    return _assignBoxesBanded(items, containers, minOverlap)
+
+def _assignBoxesVectorized(items, containers, minOverlap):
+    assigned = numpy.full(len(items), -1, dtype=numpy.int64)
+    area = (items.right - items.left) * (items.bottom - items.top)
+    batchSize = max(1, MAX_PAIRS // len(containers))
+    for start in range(0, len(items), batchSize):
+        batch = slice(start, start + batchSize)
+        width = numpy.minimum(items.right[batch, None], containers.right[None, :]) - numpy.maximum(items.left[batch, None], containers.left[None, :])
+        height = numpy.minimum(items.bottom[batch, None], containers.bottom[None, :]) - numpy.maximum(items.top[batch, None], containers.top[None, :])
+        overlap = numpy.clip(width, 0, None) * numpy.clip(height, 0, None)
+        best = overlap.argmax(axis=1)
+        bestOverlap = overlap[numpy.arange(len(best)), best]
+        covered = (bestOverlap > 0) & (bestOverlap >= minOverlap * (1 - OVERLAP_TOLERANCE) * area[batch])
+        assigned[batch] = numpy.where(covered, best, -1)
+    return assigned.tolist()
+
+#Containers are bucketed by horizontal bands of the page, so that each item is only compared with the containers of its bands
+def _assignBoxesBanded(items, containers, minOverlap):
+    cleft, ctop, cright, cbottom = list(containers.left), list(containers.top), list(containers.right), list(containers.bottom)
+    numBands = max(1, int(math.sqrt(len(cleft))))
+    pageTop = min(ctop)
+    bandHeight = max(max(cbottom) - pageTop, 1e-9) / numBands
+    bands = [[] for b in range(numBands)]
+    for c in range(len(cleft)):
+        for b in range(_band(ctop[c], pageTop, bandHeight, numBands), _band(cbottom[c], pageTop, bandHeight, numBands) + 1):
+            bands[b].append(c)
+
+    assigned = []
+    for left, top, right, bottom in zip(items.left, items.top, items.right, items.bottom):
+        firstBand = _band(top, pageTop, bandHeight, numBands)
+        lastBand = _band(bottom, pageTop, bandHeight, numBands)
+        candidates = bands[firstBand] if firstBand == lastBand else sorted(set([c for b in range(firstBand, lastBand + 1) for c in bands[b]]))
+        best = -1
+        bestOverlap = 0.0
+        for c in candidates:
+            width = min(right, cright[c]) - max(left, cleft[c])
+            height = min(bottom, cbottom[c]) - max(top, ctop[c])
+            if width > 0 and height > 0 and width * height > bestOverlap:
+                best = c
+                bestOverlap = width * height
+        if best >= 0 and bestOverlap < minOverlap * (1 - OVERLAP_TOLERANCE) * (right - left) * (bottom - top):
+            best = -1
+        assigned.append(best)
+    return assigned
+
+def _band(y, pageTop, bandHeight, numBands):
+    return min(numBands - 1, max(0, int((y - pageTop) / bandHeight)))
+
+#Function to sort boxes in reading order, top to bottom by line and left to right within a line
+#Boxes start a new line when their vertical center is more than lineTolerance median box heights below the previous one
+#Returns the indexes of the boxes in reading order
+def readingOrder(boxes, lineTolerance=0.5):
+    if len(boxes) == 0:
+        return []
+    if boxes.vectorized:
+        middle = (boxes.top + boxes.bottom) / 2
+        tolerance = lineTolerance * numpy.median(boxes.bottom - boxes.top)
+        order = numpy.argsort(middle, kind='stable')
+        lines = numpy.concatenate(([0], numpy.cumsum(numpy.diff(middle[order]) > tolerance)))
+        return order[numpy.lexsort((boxes.left[order], lines))].tolist()
+
+    middle = [(top + bottom) / 2 for top, bottom in zip(boxes.top, boxes.bottom)]
+    tolerance = lineTolerance * _median([bottom - top for top, bottom in zip(boxes.top, boxes.bottom)])
+    order = sorted(range(len(middle)), key=lambda i: middle[i])
+    lines = [0]
+    for previous, current in zip(order, order[1:]):
+        lines.append(lines[-1] + (1 if middle[current] - middle[previous] > tolerance else 0))
+    line = dict(zip(order, lines))
+    return sorted(order, key=lambda i: (line[i], boxes.left[i]))
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 == 1 else (values[middle - 1] + values[middle]) / 2
+
+#Function to group boxes whose extents along an axis overlap or lie within gap of each other, such as the columns of a page
+#for axis x, or its lines or blocks of text for axis y. Returns the group of each box, groups numbered in order along the axis
+def groupBoxes(boxes, axis='x', gap=0.0):
+    if len(boxes) == 0:
+        return []
+    low, high = (boxes.left, boxes.right) if axis == 'x' else (boxes.top, boxes.bottom)
+    if boxes.vectorized:
+        order = numpy.argsort(low, kind='stable')
+        reach = numpy.maximum.accumulate(high[order])
+        starts = low[order][1:] > reach[:-1] + gap
+        groups = numpy.empty(len(boxes), dtype=numpy.int64)
+        groups[order] = numpy.concatenate(([0], numpy.cumsum(starts)))
+        return groups.tolist()
+
+    order = sorted(range(len(low)), key=lambda i: low[i])
+    groups = [0] * len(low)
+    group = 0
+    reach = high[order[0]]
+    for i in order[1:]:
+        if low[i] > reach + gap:
+            group += 1
+        reach = max(reach, high[i])
+        groups[i] = group
+    return groups
@@ -0,0 +1,245 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+#Bodies at least this large are uploaded in parts, by the managed transfer of the S3 client
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+#Function to read the number of outputs uploaded concurrently
+def getMaxConcurrentUploads():
+    return int(os.environ['max_concurrent_uploads']) if 'max_concurrent_uploads' in os.environ else 8
+
+def _encode(body):
+    return body.encode('utf-8') if isinstance(body, str) else body
+
+#Output written to a sink in pieces, held in memory up to maxMemory bytes and spooled to local storage beyond
+#Closing it hands the whole output to its sink, under its key
+class StreamedOutput(object):
+
+    def __init__(self, sink, key, maxMemory):
+        self.sink = sink
+        self.key = key
+        self.spool = tempfile.SpooledTemporaryFile(max_size=maxMemory)
+
+    def write(self, body):
+        self.spool.write(_encode(body))
+
+    def close(self):
+        self.spool.seek(0)
+        return self.sink._writeSpooled(self.key, self.spool)
+
+#Sink uploading serialized results straight from memory to S3, several at a time
+#Writes return as soon as the upload is queued, flush waits for all of them and raises the first upload error
+class S3Sink(object):
+
+    def __init__(self, s3client, bucket, maxWorkers=None, multipartThreshold=MULTIPART_THRESHOLD):
+        if maxWorkers is None:
+            maxWorkers = getMaxConcurrentUploads()
+        self.s3client = s3client
+        self.bucket = bucket
+        self.multipartThreshold = multipartThreshold
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        #Bounds the bodies held in memory while waiting for their upload
+        self.pending = threading.BoundedSemaphore(maxWorkers * 2)
+        self.futures = []
+        self.numBytes = 0
+
+    def _upload(self, key, data):
+        try:
+            if len(data) < self.multipartThreshold:
+                self.s3client.put_object(Bucket=self.bucket, Key=key, Body=data)
+            else:
+                self.s3client.upload_fileobj(io.BytesIO(data), self.bucket, key)
+        finally:
+            self.pending.release()
+
+    def _uploadSpooled(self, key, spool, size):
+        try:
+            if size < self.multipartThreshold:
+                self.s3client.put_object(Bucket=self.bucket, Key=key, Body=spool.read())
+            else:
+                self.s3client.upload_fileobj(spool, self.bucket, key)
+        finally:
+            spool.close()
+            self.pending.release()
+
+    def write(self, key, body):
+        data = _encode(body)
+        self.pending.acquire()
+        self.numBytes += len(data)
+        self.futures.append(self.executor.submit(self._upload, key, data))
+        return key
+
+    #Open an output to write in pieces, which is uploaded once closed
+    def open(self, key):
+        return StreamedOutput(self, key, self.multipartThreshold)
+
+    def _writeSpooled(self, key, spool):
+        size = spool.seek(0, io.SEEK_END)
+        spool.seek(0)
+        self.pending.acquire()
+        self.numBytes += size
+        self.futures.append(self.executor.submit(self._uploadSpooled, key, spool, size))
+        return key
+
+    def flush(self):
+        futures = self.futures
+        self.futures = []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+#Sink writing results under a local directory, laid out as <root>/<bucket>/<key>, for tests and local runs
+class LocalSink(object):
+
+    def __init__(self, root, bucket):
+        self.root = root
+        self.bucket = bucket
+        self.numBytes = 0
+
+    def write(self, key, body):
+        data = _encode(body)
+        path = os.path.join(self.root, self.bucket, key)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as output_file:
+            output_file.write(data)
+        self.numBytes += len(data)
+        return key
+
+    def open(self, key):
+        return StreamedOutput(self, key, MULTIPART_THRESHOLD)
+
+    def _writeSpooled(self, key, spool):
+        path = os.path.join(self.root, self.bucket, key)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as output_file:
+            shutil.copyfileobj(spool, output_file)
+            self.numBytes += output_file.tell()
+        spool.close()
+        return key
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+#Function to create the sink results of a job are written to, as configured by the output_sink environment variable
+#    s3 (default): upload to the given bucket, local: write under the directory named by output_root
+def getOutputSink(s3client, bucket):
+    output_sink = os.environ['output_sink'] if 'output_sink' in os.environ else "s3"
+    if output_sink == "local":
+        return LocalSink(os.environ['output_root'], bucket)
+    return S3Sink(s3client, bucket)
+
+#Function to record the result files of a job along with its completion attributes, in as few writes as possible
+#The first write replaces the list of files, so that a redelivered completion message does not record them twice,
+#and the completion attributes are set by the last write, once every file is recorded
+def recordJobFiles(dynamodb, table_name, jobId, jobType, filesAttribute, files, attributes, chunkSize=None):
+    if chunkSize is None:
+        chunkSize = int(os.environ['files_per_update']) if 'files_per_update' in os.environ else 1000
+    chunks = [files[i:i+chunkSize] for i in range(0, len(files), chunkSize)]
+    if len(chunks) == 0:
+        chunks = [[]]
+    for chunkNumber, chunk in enumerate(chunks):
+        names = {'#files': filesAttribute}
+        values = {':files': {'L': [{'S': fileKey} for fileKey in chunk]}}
+        updates = ['#files = :files' if chunkNumber == 0 else '#files = list_append(#files, :files)']
+        if chunkNumber == len(chunks) - 1:
+            for i, (name, value) in enumerate(attributes.items()):
+                names['#a{}'.format(i)] = name
+                values[':a{}'.format(i)] = value
+                updates.append('#a{0} = :a{0}'.format(i))
+        dynamodb.update_item(
+            TableName=table_name,
+            Key={
+                'JobId':{'S':jobId},
+                'JobType':{'S':jobType}
+            },
+            ExpressionAttributeNames=names,
+            UpdateExpression='SET ' + ', '.join(updates),
+            ExpressionAttributeValues=values
+        )
+    print("{} {} recorded in {} updates".format(len(files), filesAttribute, len(chunks)))
+
+#Writer splitting a per-page output of a job into chunks of consecutive pages, along with an index of the chunks
+#Each chunk is a JSON dictionary keyed by page number, so that a range of pages is read from the few chunks overlapping it
+#    sortKeys: sort the keys of the dictionaries of each page, False keeps them in the order they were added
+class PageChunkWriter(object):
+
+    def __init__(self, sink, upload_prefix, document_name, output, pagesPerChunk, sortKeys=True):
+        self.sink = sink
+        self.upload_prefix = upload_prefix
+        self.document_name = document_name
+        self.output = output
+        self.pagesPerChunk = pagesPerChunk
+        self.sortKeys = sortKeys
+        self.chunks = []
+        self.pages = {}
+        self.firstPage = None
+        self.lastPage = None
+
+    def add(self, pageNumber, value):
+        if len(self.pages) > 0 and pageNumber >= self.firstPage + self.pagesPerChunk:
+            self._flush()
+        if len(self.pages) == 0:
+            self.firstPage = pageNumber
+        self.pages[str(pageNumber)] = value
+        self.lastPage = pageNumber
+
+    def _flush(self):
+        chunk_document = "{}-{}-pages-{}-{}.json".format(self.document_name, self.output, self.firstPage, self.lastPage)
+        chunkKey = self.sink.write("{}/{}".format(self.upload_prefix, chunk_document), json.dumps(self.pages, sort_keys=self.sortKeys))
+        self.chunks.append({'Key': chunkKey, 'FirstPage': self.firstPage, 'LastPage': self.lastPage, 'NumPages': len(self.pages)})
+        self.pages = {}
+
+    #Write the last chunk and the index, returns the key of the index
+    def close(self):
+        if len(self.pages) > 0:
+            self._flush()
+        index_document = "{}-{}-index.json".format(self.document_name, self.output)
+        print("{} pages of {} written to {} chunks".format(sum([chunk['NumPages'] for chunk in self.chunks]), self.output, len(self.chunks)))
+        return self.sink.write("{}/{}".format(self.upload_prefix, index_document), json.dumps({'Chunks': self.chunks}))
+
+#Writer streaming a JSON dictionary to an output one member at a time, so that the whole dictionary is never held in memory
+#The members are written in the order they are added, each formatted as json.dumps with the given indent and sort_keys would
+class JsonObjectWriter(object):
+
+    def __init__(self, output, indent=4, sortKeys=True):
+        self.output = output
+        self.indent = indent
+        self.sortKeys = sortKeys
+        self.numMembers = 0
+
+    def add(self, key, value):
+        member = json.dumps(value, indent=self.indent, sort_keys=self.sortKeys).replace('\n', '\n' + ' ' * self.indent)
+        self.output.write('{}\n{}{}: {}'.format('{' if self.numMembers == 0 else ',', ' ' * self.indent, json.dumps(key), member))
+        self.numMembers += 1
+
+    #Write the end of the dictionary and close the output, returns the key of the output
+    def close(self):
+        self.output.write('{}' if self.numMembers == 0 else '\n}')
+        return self.output.close()
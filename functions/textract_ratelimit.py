@@ -0,0 +1,331 @@
+import os
+import time
+import random
+import threading
+
+#Names of the Textract start operations governed, used to key limiter state and environment variables
+GOVERNED_APIS = {
+    'DocumentAnalysis': 'document_analysis',
+    'TextDetection': 'text_detection'
+}
+
+#Seconds after which the slot of an open job is given back, even if its completion message never arrived
+#A job still running past its expiry lets one more job start than the limit, which Textract throttles and submissions retry
+DEFAULT_SLOT_EXPIRY = 3 * 3600
+
+#OpenJobSlot of a job record once its slot is given back
+RELEASED = 'RELEASED'
+
+def _errorCode(e):
+    return e.response['Error']['Code'] if hasattr(e, 'response') and 'Error' in e.response else None
+
+#Token bucket held in memory, shared by the threads of one process
+class TokenBucket(object):
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.lastRefill = time.time()
+        self.lock = threading.Lock()
+
+    #Take tokens if available, otherwise return the number of seconds to wait before trying again
+    def tryAcquire(self, tokens=1):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.lastRefill) * self.rate)
+            self.lastRefill = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+#Token bucket held in the tracking table, shared by all concurrent Lambda invocations
+#The bucket is refilled lazily by whoever takes the next token, guarded by a conditional write on the refill time
+class DynamoTokenBucket(object):
+
+    def __init__(self, dynamodb, table_name, name, rate, capacity=None):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key = {'JobId': {'S': "RateLimit#{}".format(name)}, 'JobType': {'S': 'RateLimit'}}
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+
+    def tryAcquire(self, tokens=1):
+        response = self.dynamodb.get_item(TableName=self.table_name, Key=self.key, ConsistentRead=True)
+        now = time.time()
+        if 'Item' in response and 'LastRefill' in response['Item']:
+            lastRefill = response['Item']['LastRefill']['N']
+            available = float(response['Item']['Tokens']['N']) + max(0.0, now - float(lastRefill)) * self.rate
+            condition = 'LastRefill = :lastRefill'
+            values = {':lastRefill': {'N': lastRefill}}
+        else:
+            available = self.capacity
+            condition = 'attribute_not_exists(LastRefill)'
+            values = {}
+        available = min(self.capacity, available)
+        if available < tokens:
+            return (tokens - available) / self.rate
+
+        values[':tokens'] = {'N': repr(available - tokens)}
+        values[':now'] = {'N': repr(now)}
+        try:
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression='SET Tokens = :tokens, LastRefill = :now',
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values
+            )
+        except Exception as e:
+            if _errorCode(e) != 'ConditionalCheckFailedException':
+                raise
+            #Another invocation took a token in between, try again after a short pause
+            return random.uniform(0, 1.0 / self.rate)
+        return 0.0
+
+#Counter of open jobs held in memory, each open job holds a slot until it is released or expires
+#Jobs holding a slot are tracked by id, with the slot they hold
+class OpenJobCounter(object):
+
+    def __init__(self, limit, slotExpiry=DEFAULT_SLOT_EXPIRY):
+        self.limit = int(limit)
+        self.slotExpiry = slotExpiry
+        self.slots = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    #Take a slot if one is available, slots past their expiry are given back first, returns the slot or None
+    def tryAcquire(self):
+        with self.lock:
+            now = time.time()
+            for slot in [slot for slot, expiry in self.slots.items() if expiry <= now]:
+                del self.slots[slot]
+            if len(self.slots) >= self.limit:
+                return None
+            slot = os.urandom(16).hex()
+            self.slots[slot] = now + self.slotExpiry
+            return slot
+
+    def release(self, slot):
+        with self.lock:
+            self.slots.pop(slot, None)
+
+    #Record that a started job holds the given slot, returns False if the job was already known
+    def claim(self, jobId, jobType, slot):
+        with self.lock:
+            if (jobId, jobType) in self.jobs:
+                return False
+            self.jobs[(jobId, jobType)] = slot
+            return True
+
+    #Give back the slot held by a finished job, at most once per job
+    def releaseJob(self, jobId, jobType):
+        with self.lock:
+            previous = self.jobs.get((jobId, jobType))
+            self.jobs[(jobId, jobType)] = RELEASED
+        if previous is None or previous == RELEASED:
+            return False
+        self.release(previous)
+        return True
+
+#Counter of open jobs held in the tracking table, shared by all concurrent Lambda invocations
+#Each open job holds a slot in the Slots map of the counter record, along with the time the slot expires, so that the slots
+#of jobs whose completion message never arrives, or whose completion failed before the release, are eventually given back
+#Each job record carries an OpenJobSlot attribute naming its slot, so that duplicate submissions and duplicate completion
+#messages never count a job twice, even when the completion is processed before the submission is recorded
+class DynamoOpenJobCounter(object):
+
+    def __init__(self, dynamodb, table_name, name, limit, slotExpiry=DEFAULT_SLOT_EXPIRY):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.key = {'JobId': {'S': "OpenJobs#{}".format(name)}, 'JobType': {'S': 'RateLimit'}}
+        self.limit = int(limit)
+        self.slotExpiry = slotExpiry
+
+    #Take a slot if one is available, returns the slot or None
+    #When the counter looks full, the slots past their expiry are given back and the slot is asked for once more
+    def tryAcquire(self):
+        slot = os.urandom(16).hex()
+        for attempt in range(2):
+            try:
+                self.dynamodb.update_item(
+                    TableName=self.table_name,
+                    Key=self.key,
+                    UpdateExpression='SET Slots.#slot = :expiry',
+                    ConditionExpression='size(Slots) < :limit',
+                    ExpressionAttributeNames={'#slot': slot},
+                    ExpressionAttributeValues={':expiry': {'N': str(int(time.time() + self.slotExpiry))}, ':limit': {'N': str(self.limit)}}
+                )
+                return slot
+            except Exception as e:
+                if _errorCode(e) != 'ConditionalCheckFailedException':
+                    raise
+            if not self._expireSlots():
+                return None
+        return None
+
+    #Remove the slots past their expiry, creating the map of slots on first use, returns False if no slot was freed
+    def _expireSlots(self):
+        response = self.dynamodb.get_item(TableName=self.table_name, Key=self.key, ConsistentRead=True)
+        if 'Item' not in response or 'Slots' not in response['Item']:
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression='SET Slots = if_not_exists(Slots, :empty)',
+                ExpressionAttributeValues={':empty': {'M': {}}}
+            )
+            return True
+        now = time.time()
+        expired = [slot for slot, expiry in response['Item']['Slots']['M'].items() if float(expiry['N']) <= now]
+        if len(expired) == 0:
+            return False
+        #Expired slots are never renewed, so they can be removed without any condition, at most 100 per update
+        for start in range(0, len(expired), 100):
+            names = dict(("#s{}".format(i), slot) for i, slot in enumerate(expired[start:start+100]))
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key=self.key,
+                UpdateExpression='REMOVE ' + ', '.join(["Slots.{}".format(name) for name in names.keys()]),
+                ExpressionAttributeNames=names
+            )
+        print("Gave back {} expired open job slots".format(len(expired)))
+        return True
+
+    #Give back a slot, releasing a slot already given back has no effect
+    def release(self, slot):
+        self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key=self.key,
+            UpdateExpression='REMOVE Slots.#slot',
+            ExpressionAttributeNames={'#slot': slot}
+        )
+
+    def claim(self, jobId, jobType, slot):
+        try:
+            self.dynamodb.update_item(
+                TableName=self.table_name,
+                Key={'JobId': {'S': jobId}, 'JobType': {'S': jobType}},
+                UpdateExpression='SET OpenJobSlot = :slot',
+                ConditionExpression='attribute_not_exists(OpenJobSlot)',
+                ExpressionAttributeValues={':slot': {'S': slot}}
+            )
+        except Exception as e:
+            if _errorCode(e) != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def releaseJob(self, jobId, jobType):
+        response = self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key={'JobId': {'S': jobId}, 'JobType': {'S': jobType}},
+            UpdateExpression='SET OpenJobSlot = :released',
+            ExpressionAttributeValues={':released': {'S': RELEASED}},
+            ReturnValues='UPDATED_OLD'
+        )
+        previous = response['Attributes']['OpenJobSlot']['S'] if 'Attributes' in response and 'OpenJobSlot' in response['Attributes'] else None
+        if previous is None or previous == RELEASED:
+            return False
+        self.release(previous)
+        return True
+
+#Governor pacing the start calls of one Textract operation to its TPS limit, and keeping its open jobs under the quota
+class SubmissionGovernor(object):
+
+    def __init__(self, rateLimiter=None, openJobs=None, timeout=300, pollInterval=5):
+        self.rateLimiter = rateLimiter
+        self.openJobs = openJobs
+        self.timeout = timeout
+        self.pollInterval = pollInterval
+        self.waitTime = 0.0
+
+    def _wait(self, delay, deadline):
+        delay = min(delay, max(0.0, deadline - time.time()))
+        self.waitTime += delay
+        time.sleep(delay)
+
+    #Wait for a start token, returns False if none became available within the timeout
+    def acquireStartToken(self):
+        if self.rateLimiter is None:
+            return True
+        deadline = time.time() + self.timeout
+        while True:
+            delay = self.rateLimiter.tryAcquire()
+            if delay <= 0:
+                return True
+            if time.time() + delay > deadline:
+                return False
+            self._wait(delay, deadline)
+
+    #Wait for an open job slot, returns the slot acquired, an empty string when open jobs are not limited,
+    #or None if no slot became available within the timeout
+    def acquireJobSlot(self):
+        if self.openJobs is None:
+            return ""
+        deadline = time.time() + self.timeout
+        while True:
+            slot = self.openJobs.tryAcquire()
+            if slot is not None:
+                return slot
+            if time.time() >= deadline:
+                return None
+            self._wait(random.uniform(0.5, 1.5) * self.pollInterval, deadline)
+
+    def releaseJobSlot(self, slot):
+        if self.openJobs is not None:
+            self.openJobs.release(slot)
+
+    #Attach the acquired slot to the started job, giving it back if the job was already counted
+    def claimJob(self, jobId, jobType, slot):
+        if self.openJobs is not None and not self.openJobs.claim(jobId, jobType, slot):
+            print("{} job {} was already counted, releasing the slot acquired for it".format(jobType, jobId))
+            self.openJobs.release(slot)
+
+_localGovernors = {}
+_localGovernorsLock = threading.Lock()
+
+#Function to build the governor of a Textract operation from environment variables, returns None when no limit is configured
+#    rate_limit_backend: "dynamodb" to share limits across invocations through the tracking table, "memory" for one process
+#    <api>_start_tps: start calls per second, <api>_open_job_limit: maximum number of open jobs
+#    open_job_slot_expiry: seconds after which the slot of an open job is given back (3 hours by default)
+def getSubmissionGovernor(jobType, dynamodb=None, table_name=None):
+    backend = os.environ['rate_limit_backend'] if 'rate_limit_backend' in os.environ else ""
+    prefix = GOVERNED_APIS[jobType]
+    startTps = float(os.environ[prefix + '_start_tps']) if prefix + '_start_tps' in os.environ else None
+    openJobLimit = int(os.environ[prefix + '_open_job_limit']) if prefix + '_open_job_limit' in os.environ else None
+    timeout = float(os.environ['submission_wait_timeout']) if 'submission_wait_timeout' in os.environ else 300
+    slotExpiry = float(os.environ['open_job_slot_expiry']) if 'open_job_slot_expiry' in os.environ else DEFAULT_SLOT_EXPIRY
+    if backend == "" or (startTps is None and openJobLimit is None):
+        return None
+
+    if backend == "memory":
+        with _localGovernorsLock:
+            if jobType not in _localGovernors:
+                _localGovernors[jobType] = SubmissionGovernor(
+                    TokenBucket(startTps) if startTps is not None else None,
+                    OpenJobCounter(openJobLimit, slotExpiry) if openJobLimit is not None else None,
+                    timeout)
+            return _localGovernors[jobType]
+
+    if table_name is None:
+        table_name = os.environ['table_name']
+    return SubmissionGovernor(
+        DynamoTokenBucket(dynamodb, table_name, jobType, startTps) if startTps is not None else None,
+        DynamoOpenJobCounter(dynamodb, table_name, jobType, openJobLimit, slotExpiry) if openJobLimit is not None else None,
+        timeout)
+
+#Function to give back the open job slot held by a finished job, called once Textract reports the job completion
+#Errors are only printed, so that they never keep the completion from being processed, the slot then expires on its own
+def releaseOpenJob(jobId, jobType, dynamodb=None, table_name=None):
+    try:
+        governor = getSubmissionGovernor(jobType, dynamodb, table_name)
+        if governor is None or governor.openJobs is None:
+            return False
+        released = governor.openJobs.releaseJob(jobId, jobType)
+    except Exception as e:
+        print('Open job release error is: {0}'.format(e))
+        return False
+    if released:
+        print("Released open job slot held by {} job {}".format(jobType, jobId))
+    return released
@@ -0,0 +1,262 @@
+import os
+import gzip
+import json
+import time
+import queue
+import random
+import threading
+
+#Textract error codes that are worth retrying, and those that end the retrieval straight away
+RETRYABLE_ERROR_CODES = set(['ThrottlingException', 'ProvisionedThroughputExceededException', 'InternalServerError', 'LimitExceededException', 'ServiceUnavailable', 'RequestTimeout'])
+
+TERMINAL_ERROR_CODES = set(['AccessDeniedException', 'InvalidJobIdException', 'InvalidParameterException', 'InvalidKMSKeyException', 'InvalidS3ObjectException'])
+
+ERROR_MESSAGES = {
+    'AccessDeniedException': "You aren't authorized to perform textract.analyze_document action.",
+    'InvalidJobIdException': "An invalid job identifier was passed.",
+    'InvalidParameterException': "An input parameter violated a constraint.",
+    'InternalServerError': "Amazon Textract experienced a service issue.",
+    'ProvisionedThroughputExceededException': "The number of requests exceeded your throughput limit.",
+    'ThrottlingException': "Amazon Textract is temporarily unable to process the request."
+}
+
+#Function to read the botocore error code of an exception, None for errors that did not come from the service
+def getErrorCode(e):
+    if hasattr(e, 'response') and isinstance(e.response, dict) and 'Error' in e.response:
+        return e.response['Error'].get('Code')
+    return None
+
+#Function to tell connection failures and read timeouts of botocore, which carry no error code, from other errors
+def isConnectionError(e):
+    from botocore.exceptions import ConnectionError, HTTPClientError
+    return isinstance(e, (ConnectionError, HTTPClientError))
+
+#Retry policy with full jitter exponential backoff, limited per call and by a retry budget shared across a job
+class RetryPolicy(object):
+
+    def __init__(self, retryInterval, maxRetryInterval, maxRetryAttempt, retryBudget):
+        self.retryInterval = retryInterval
+        self.maxRetryInterval = maxRetryInterval
+        self.maxRetryAttempt = maxRetryAttempt
+        self.retryBudget = retryBudget
+        self.retries = 0
+        self.sleepTime = 0.0
+
+    @classmethod
+    def fromEnvironment(cls):
+        retryInterval = float(os.environ['retry_interval']) #30
+        maxRetryAttempt = int(os.environ['max_retry_attempt']) #5
+        maxRetryInterval = float(os.environ['max_retry_interval']) if 'max_retry_interval' in os.environ else retryInterval * 2 ** maxRetryAttempt
+        retryBudget = int(os.environ['retry_budget']) if 'retry_budget' in os.environ else maxRetryAttempt * 4
+        return cls(retryInterval, maxRetryInterval, maxRetryAttempt, retryBudget)
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.maxRetryInterval, self.retryInterval * 2 ** attempt))
+
+    def call(self, function, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return function(**kwargs)
+            except Exception as e:
+                errorCode = getErrorCode(e)
+                if errorCode is None and isConnectionError(e):
+                    errorCode = type(e).__name__
+                elif errorCode not in RETRYABLE_ERROR_CODES:
+                    raise
+                if attempt >= self.maxRetryAttempt or self.retries >= self.retryBudget:
+                    print("{} Giving up after {} attempts, with {} of {} retries of the budget used.".format(
+                        ERROR_MESSAGES.get(errorCode, errorCode), attempt + 1, self.retries, self.retryBudget))
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self.retries += 1
+                self.sleepTime += delay
+                print("{} Trying again in {:.1f} seconds, attempt {} of {}.".format(
+                    ERROR_MESSAGES.get(errorCode, errorCode), delay, attempt + 1, self.maxRetryAttempt + 1))
+                time.sleep(delay)
+
+#Function to retrieve result of completed job, yielding each page of results as its NextToken page arrives
+def iterJobResult(getResult, jobId, apiName, retryPolicy=None):
+    maxResults = int(os.environ['max_results']) #1000
+    paginationToken = None
+    finished = False 
+    if retryPolicy is None:
+        retryPolicy = RetryPolicy.fromEnvironment()
+
+    while finished == False:
+        try:
+            if paginationToken is None:
+                response = retryPolicy.call(getResult, JobId=jobId,
+                                            MaxResults=maxResults)  
+            else:
+                response = retryPolicy.call(getResult, JobId=jobId,
+                                            MaxResults=maxResults,
+                                            NextToken=paginationToken)
+        except Exception as e:
+            errorCode = getErrorCode(e)
+            if errorCode in TERMINAL_ERROR_CODES and paginationToken is None:
+                print(ERROR_MESSAGES.get(errorCode, e))
+                return
+            #Past the first page, the pages already yielded are only part of the result, which must not be taken as complete
+            print(e)
+            print("Result retrieval failed, after {} retries and {:.1f} seconds of backoff, aborting".format(retryPolicy.retries, retryPolicy.sleepTime))
+            raise
+
+        #Get the text blocks
+        if 'Blocks' in response:
+            print ('Retrieved {} Blocks from Textract {} response'.format(len(response['Blocks']), apiName))
+        else:
+            print("No blocks found in Textract {} response, could be a result of unreadable document.".format(apiName))
+            finished = True
+
+        if 'NextToken' in response:
+            paginationToken = response['NextToken']
+        else:
+            paginationToken = None
+            finished = True  
+
+        yield response
+
+    print("Textract {} result retrieved with {} retries and {:.1f} seconds of backoff".format(apiName, retryPolicy.retries, retryPolicy.sleepTime))
+
+#Function to read ahead of the consumer, with a background thread keeping up to prefetchDepth items queued
+def iterPrefetched(items, prefetchDepth):
+    if prefetchDepth <= 0:
+        for item in items:
+            yield item
+        return
+
+    prefetched = queue.Queue(maxsize=prefetchDepth)
+    stopped = threading.Event()
+    finished = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                prefetched.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((finished, None))
+        except BaseException as e:
+            put((finished, e))
+
+    producer = threading.Thread(target=produce)
+    producer.daemon = True
+    producer.start()
+    try:
+        while True:
+            #Poll rather than wait, so that a producer ending without a last entry cannot leave the consumer waiting
+            try:
+                item, error = prefetched.get(timeout=0.1)
+            except queue.Empty:
+                if producer.is_alive() or not prefetched.empty():
+                    continue
+                raise RuntimeError("Prefetching stopped before the end of the results")
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+#Function to read the number of result pages to prefetch ahead of processing, none by default
+def getPrefetchDepth():
+    if 'prefetch_depth' in os.environ:
+        return int(os.environ['prefetch_depth'])
+    return 0
+
+#Function to retrieve result of completed analysis job, one page of results at a time
+def iterDocumentAnalysisResult(textract, jobId, prefetchDepth=None, retryPolicy=None):
+    if prefetchDepth is None:
+        prefetchDepth = getPrefetchDepth()
+    return iterPrefetched(iterJobResult(textract.get_document_analysis, jobId, "Document Analysis", retryPolicy), prefetchDepth)
+
+#Function to retrieve result of completed text detection job, one page of results at a time
+def iterTextDetectionResult(textract, jobId, prefetchDepth=None, retryPolicy=None):
+    if prefetchDepth is None:
+        prefetchDepth = getPrefetchDepth()
+    return iterPrefetched(iterJobResult(textract.get_document_text_detection, jobId, "Text Detection", retryPolicy), prefetchDepth)
+
+#Function to stream the blocks out of pages of results, recording document metadata as it arrives
+def iterResultBlocks(responses, documentMetadata=None):
+    for response in responses:
+        if documentMetadata is not None and 'DocumentMetadata' in response:
+            documentMetadata.update(response['DocumentMetadata'])
+        if 'Blocks' in response:
+            for block in response['Blocks']:
+                yield block
+
+#Function to group streamed blocks by the document page they belong to
+#Textract returns the blocks of a job in page order, so only one page is held at a time, and blocks of a page
+#arriving after those of another page raise a ValueError rather than splitting the page in two
+def iterBlocksByPage(blocks):
+    pageNumber = None
+    pageBlocks = []
+    seenPages = set()
+    for block in blocks:
+        blockPage = block.get('Page', 1)
+        if len(pageBlocks) > 0 and blockPage != pageNumber:
+            yield pageNumber, pageBlocks
+            pageBlocks = []
+        if blockPage != pageNumber:
+            if blockPage in seenPages:
+                raise ValueError("Blocks of page {} arrived after those of page {}, the result is not in page order".format(blockPage, pageNumber))
+            seenPages.add(blockPage)
+        pageNumber = blockPage
+        pageBlocks.append(block)
+    if len(pageBlocks) > 0:
+        yield pageNumber, pageBlocks
+
+#Function to store streamed blocks as gzip compressed JSON lines, one block per line
+def writeStoredBlocks(blocks, path):
+    numBlocks = 0
+    with gzip.open(path, 'wt') as storedBlocks:
+        for block in blocks:
+            storedBlocks.write(json.dumps(block, separators=(',', ':')))
+            storedBlocks.write('\n')
+            numBlocks += 1
+    return numBlocks
+
+#Function to stream blocks back out of a result stored on S3, decompressing as the object is read
+#Block stores are downloaded to local storage and read memory mapped instead, the mapping stays
+#valid after the file is removed, and is released once the last block read from it is released
+#The block store module is only imported for block stores, sparing its import to functions reading JSON lines
+def iterStoredBlocks(s3client, bucket, key):
+    if key.endswith(".txbs"):
+        from textract_blockstore import downloadBlockStore
+        path = "/tmp/" + key[key.rfind("/")+1:]
+        store = downloadBlockStore(s3client, bucket, key, path)
+        os.remove(path)
+        for block in store:
+            yield block
+        return
+    s3_response = s3client.get_object(Bucket=bucket, Key=key)
+    with gzip.GzipFile(fileobj=s3_response['Body']) as storedBlocks:
+        for line in storedBlocks:
+            yield json.loads(line.decode('utf-8'))
+
+#Function to retrieve result of completed analysis job
+def GetDocumentAnalysisResult(textract, jobId):
+    documentMetadata = {}
+    result = list(iterResultBlocks(iterDocumentAnalysisResult(textract, jobId), documentMetadata))
+    if 'Pages' not in documentMetadata:
+        return 0, result
+    return documentMetadata['Pages'], result
+
+#Function to retrieve result of completed text detection job
+def GetTextDetectionResult(textract, jobId):
+    documentMetadata = {}
+    result = list(iterResultBlocks(iterTextDetectionResult(textract, jobId), documentMetadata))
+    if 'Pages' not in documentMetadata:
+        return 0, result
+    return documentMetadata['Pages'], result
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+#Function to look up the most recently started job of a given type for a document, through the document index
+#The index is keyed on DocumentKey and DocumentBucket, which every job record carries, and projects whole items
+def findLatestJob(table, bucket, key, jobType, indexName=None):
+    if indexName is None:
+        indexName = os.environ['document_index'] if 'document_index' in os.environ else "DocumentKeyIndex"
+    queryArgs = {
+        'IndexName': indexName,
+        'KeyConditionExpression': "DocumentKey = :key and DocumentBucket = :bucket",
+        'FilterExpression': "JobType = :jobType",
+        'ExpressionAttributeValues': {":bucket": bucket, ":key": key, ":jobType": jobType}
+    }
+    item = None
+    recordsMatched = 0
+    while True:
+        response = table.query(**queryArgs)
+        for candidate in response['Items']:
+            recordsMatched += 1
+            if item is None or candidate['JobStartTimeStamp'] > item['JobStartTimeStamp']:
+                item = candidate
+        if 'LastEvaluatedKey' not in response:
+            break
+        queryArgs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    print("{} matching records found for {}/{}".format(recordsMatched, bucket, key))
+    return item
+
+#Function to read the number of S3 objects to read concurrently when assembling results
+def getMaxConcurrentReads():
+    return int(os.environ['max_concurrent_reads']) if 'max_concurrent_reads' in os.environ else 16
+
+#Function to read several result objects from S3 concurrently, each one parsed by its worker as soon as it is downloaded
+#Results come back in the order of the keys, each along with the time spent downloading and parsing it
+def fetchObjects(s3client, bucket, keys, parse, maxWorkers=None):
+    if maxWorkers is None:
+        maxWorkers = getMaxConcurrentReads()
+
+    def fetch(key):
+        started = time.time()
+        body = s3client.get_object(Bucket=bucket, Key=key)['Body'].read()
+        downloaded = time.time()
+        result = parse(body)
+        return result, {'Key': key, 'Bytes': len(body), 'Download': downloaded - started, 'Parse': time.time() - downloaded}
+
+    if len(keys) <= 1 or maxWorkers <= 1:
+        return [fetch(key) for key in keys]
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(keys))) as executor:
+        return list(executor.map(fetch, keys))
+
+#Function to read the tables of a job out of its bundles, each bundle is read once and split along the offsets of the index
+#Returns the parsed tables in index order, and the read timings of the bundles
+def fetchBundledTables(s3client, bucket, indexKey, parse, maxWorkers=None):
+    index = json.loads(s3client.get_object(Bucket=bucket, Key=indexKey)['Body'].read())
+    bundleResults = fetchObjects(s3client, bucket, index['Bundles'], lambda body: body, maxWorkers)
+    timings = [timing for body, timing in bundleResults]
+    tables = []
+    for entry in index['Tables']:
+        body, timing = bundleResults[entry['Bundle']]
+        started = time.time()
+        tables.append(parse(body[entry['Offset']:entry['Offset'] + entry['Length']]))
+        timing['Parse'] += time.time() - started
+    return tables, timings
+
+#Function to summarize the timings of concurrent reads, for debugging retrieval latency
+def summarizeFetchTimings(timings, elapsed):
+    summary = {
+        'NumObjects': len(timings),
+        'Bytes': sum([timing['Bytes'] for timing in timings]),
+        'Elapsed': round(elapsed, 4),
+        'Download': round(sum([timing['Download'] for timing in timings]), 4),
+        'Parse': round(sum([timing['Parse'] for timing in timings]), 4)
+    }
+    if len(timings) > 0:
+        slowest = max(timings, key=lambda timing: timing['Download'] + timing['Parse'])
+        summary['Slowest'] = {'Key': slowest['Key'], 'Download': round(slowest['Download'], 4), 'Parse': round(slowest['Parse'], 4)}
+    return summary
+
+#Function to read the pages of a range out of the chunks overlapping it, as listed by a chunk index
+#Returns the pages of the range in page order, as (page number, value) pairs, and the read timings of the index and chunks
+def fetchPageRange(s3client, bucket, indexKey, firstPage, lastPage, maxWorkers=None):
+    index, indexTiming = fetchObjects(s3client, bucket, [indexKey], json.loads)[0]
+    chunkKeys = [chunk['Key'] for chunk in index['Chunks'] if chunk['LastPage'] >= firstPage and chunk['FirstPage'] <= lastPage]
+    chunkResults = fetchObjects(s3client, bucket, chunkKeys, json.loads, maxWorkers)
+    pages = []
+    for chunk, chunkTiming in chunkResults:
+        pages.extend([(int(page), value) for page, value in chunk.items() if firstPage <= int(page) <= lastPage])
+    pages.sort(key=lambda page: page[0])
+    return pages, [indexTiming] + [chunkTiming for chunk, chunkTiming in chunkResults]
+
+def encodeCursor(cursor):
+    return base64.urlsafe_b64encode(json.dumps(cursor, sort_keys=True).encode('utf-8')).decode('utf-8')
+
+def decodeCursor(cursor):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8'))
+        return {'JobId': decoded['JobId'], 'Page': int(decoded['Page']), 'LastPage': int(decoded['LastPage']), 'Limit': int(decoded['Limit'])}
+    except Exception:
+        raise ValueError("Invalid Cursor {}".format(cursor))
+
+#Function to select the pages returned by a paginated retrieval request, out of the pages of a job
+#    FirstPage, LastPage: range of pages requested, Offset: number of pages of the range to skip, Limit: maximum number of pages returned
+#    Cursor: NextCursor of the previous response, to continue through the same range, along with none of the other parameters
+#Returns None for requests without any of these parameters, which return every page, and raises ValueError for invalid ones,
+#such as empty or inverted ranges, ranges starting past the last page of the job, or negative offsets
+def selectPages(event, jobId, numPages):
+    params = {}
+    for name in ['FirstPage', 'LastPage', 'Offset', 'Limit', 'Cursor']:
+        if name in event and str(event[name]) != "":
+            params[name] = str(event[name])
+    if len(params) == 0:
+        return None
+
+    if 'Cursor' in params:
+        if len(params) > 1:
+            raise ValueError("Cursor cannot be combined with {}".format(", ".join(sorted([name for name in params.keys() if name != 'Cursor']))))
+        cursor = decodeCursor(params['Cursor'])
+        if cursor['JobId'] != jobId:
+            raise ValueError("Cursor does not belong to job {}".format(jobId))
+        firstPage, lastPage, limit = cursor['Page'], cursor['LastPage'], cursor['Limit']
+    else:
+        try:
+            firstPage = int(params['FirstPage']) if 'FirstPage' in params else 1
+            lastPage = int(params['LastPage']) if 'LastPage' in params else numPages
+            offset = int(params['Offset']) if 'Offset' in params else 0
+            limit = int(params['Limit']) if 'Limit' in params else 0
+        except ValueError:
+            raise ValueError("Invalid page selection {}".format(json.dumps(params)))
+        if offset < 0:
+            raise ValueError("Offset must not be negative")
+        firstPage += offset
+    if firstPage < 1 or limit < 0:
+        raise ValueError("Invalid page selection {}".format(json.dumps(params)))
+    if firstPage > numPages:
+        raise ValueError("Page {} is out of range, the document has {} pages".format(firstPage, numPages))
+    if lastPage < firstPage:
+        raise ValueError("Invalid page selection {}, LastPage comes before FirstPage".format(json.dumps(params)))
+
+    lastPage = min(lastPage, numPages)
+    selection = {'FirstPage': firstPage, 'LastPage': lastPage if limit == 0 else min(lastPage, firstPage + limit - 1)}
+    if selection['LastPage'] < lastPage:
+        selection['NextCursor'] = encodeCursor({'JobId': jobId, 'Page': selection['LastPage'] + 1, 'LastPage': lastPage, 'Limit': limit})
+    return selection
@@ -0,0 +1,112 @@
+import os
+import math
+from textract_blocks import BlockExtractor
+
+#Spatial index of the blocks of a page, a uniform grid over the page where each grid cell lists the blocks overlapping it
+#Coordinates are those of Textract bounding boxes, ratios of the page width and height between 0 and 1
+#    Columns: names of the values of each entry, Entries: one list of values per block, in the order of the response
+#    GridSize: number of grid cells along each side of the page, Grid: entry numbers of each grid cell, row by row
+COLUMNS = ['BlockType', 'Text', 'Left', 'Top', 'Width', 'Height']
+
+#Function to read the types of blocks indexed, the size of the grid and the number of pages per chunk of indexes
+#    spatial_index_types: comma separated block types (WORD,LINE by default), spatial_grid_size: grid cells per side (16)
+#    spatial_pages_per_chunk: pages whose indexes are saved together (1 by default, so that a query reads a single page)
+def getSpatialIndexSettings():
+    blockTypes = os.environ['spatial_index_types'].split(',') if 'spatial_index_types' in os.environ else ['WORD', 'LINE']
+    gridSize = int(os.environ['spatial_grid_size']) if 'spatial_grid_size' in os.environ else 16
+    pagesPerChunk = int(os.environ['spatial_pages_per_chunk']) if 'spatial_pages_per_chunk' in os.environ else 1
+    return blockTypes, gridSize, pagesPerChunk
+
+def _gridRange(low, high, gridSize):
+    return range(min(gridSize - 1, max(0, int(low * gridSize))), min(gridSize - 1, max(0, int(high * gridSize))) + 1)
+
+#Function to build the spatial index of a page from its entries, as listed by COLUMNS
+def buildPageIndex(entries, gridSize):
+    grid = [[] for i in range(gridSize * gridSize)]
+    for number, entry in enumerate(entries):
+        left, top, width, height = entry[2:6]
+        for row in _gridRange(top, top + height, gridSize):
+            for column in _gridRange(left, left + width, gridSize):
+                grid[row * gridSize + column].append(number)
+    return {'Columns': COLUMNS, 'GridSize': gridSize, 'Entries': entries, 'Grid': grid}
+
+#Function to find the blocks of a page lying within a region, at least minOverlap of their area inside it
+#Only the grid cells overlapping the region are visited, blocks are returned in the order of the response
+def queryPageIndex(pageIndex, left, top, width, height, blockTypes=None, minOverlap=0.5):
+    gridSize = pageIndex['GridSize']
+    entries = pageIndex['Entries']
+    candidates = set()
+    for row in _gridRange(top, top + height, gridSize):
+        for column in _gridRange(left, left + width, gridSize):
+            candidates.update(pageIndex['Grid'][row * gridSize + column])
+
+    blocks = []
+    for number in sorted(candidates):
+        blockType, text, entryLeft, entryTop, entryWidth, entryHeight = entries[number]
+        if blockTypes is not None and blockType not in blockTypes:
+            continue
+        overlapWidth = min(left + width, entryLeft + entryWidth) - max(left, entryLeft)
+        overlapHeight = min(top + height, entryTop + entryHeight) - max(top, entryTop)
+        if overlapWidth <= 0 or overlapHeight <= 0:
+            continue
+        if overlapWidth * overlapHeight < minOverlap * (1 - 1e-9) * entryWidth * entryHeight:
+            continue
+        blocks.append({
+            'BlockType': blockType,
+            'Text': text,
+            'BoundingBox': {'Left': entryLeft, 'Top': entryTop, 'Width': entryWidth, 'Height': entryHeight}
+        })
+    return blocks
+
+#Function to read the region of a region query, out of the pages of a job
+#    Page: page of the region, Left, Top, Width, Height: bounding box of the region, as ratios of the page size
+#    BlockType: comma separated types of blocks returned, every indexed type by default
+#    MinOverlap: share of the area of a block that must lie within the region, 0.5 by default
+#Returns None for requests without any of these parameters, and raises ValueError for invalid ones, such as nan or inf
+def selectRegion(event, numPages):
+    names = ['Page', 'Left', 'Top', 'Width', 'Height']
+    params = {}
+    for name in names + ['BlockType', 'MinOverlap']:
+        if name in event and str(event[name]) != "":
+            params[name] = str(event[name])
+    if len([name for name in names if name in params]) == 0:
+        return None
+    missing = [name for name in names if name not in params]
+    if len(missing) > 0:
+        raise ValueError("Region query is missing {}".format(", ".join(missing)))
+    try:
+        region = {'Page': int(params['Page'])}
+        for name in names[1:] + ['MinOverlap']:
+            if name in params:
+                region[name] = float(params[name])
+                if math.isnan(region[name]) or math.isinf(region[name]):
+                    raise ValueError(name)
+    except ValueError:
+        raise ValueError("Invalid region {}".format(", ".join(["{}={}".format(name, params[name]) for name in names + ['MinOverlap'] if name in params])))
+    if region['Page'] < 1 or region['Page'] > numPages:
+        raise ValueError("Page {} is out of range, the document has {} pages".format(region['Page'], numPages))
+    if region['Width'] <= 0 or region['Height'] <= 0:
+        raise ValueError("Region Width and Height must be positive")
+    if 'MinOverlap' in region and not 0 <= region['MinOverlap'] <= 1:
+        raise ValueError("MinOverlap must be between 0 and 1")
+    if 'BlockType' in params:
+        region['BlockType'] = [blockType.strip().upper() for blockType in params['BlockType'].split(',')]
+    return region
+
+#Extractor of the spatial index of a page, from the blocks of the given types dispatched to it
+class SpatialIndexExtractor(BlockExtractor):
+
+    def __init__(self, blockTypes=('WORD', 'LINE'), gridSize=16):
+        self.gridSize = gridSize
+        self.blockTypes = tuple(blockTypes)
+        BlockExtractor.__init__(self)
+
+    def reset(self):
+        self.entries = []
+
+    def visit(self, block):
+        box = block['Geometry']['BoundingBox']
+        self.entries.append([block['BlockType'], block.get('Text', ""), box['Left'], box['Top'], box['Width'], box['Height']])
+
+    def result(self):
+        return buildPageIndex(self.entries, self.gridSize)
@@ -0,0 +1,380 @@
+import io
+import sys
+import json
+from collections import defaultdict
+from textract_blocks import indexBlocks, findParent, childIds, BlockExtractor
+
+#Function to extract table information from the raw JSON returned by Textract
+def extractTableBlocks(json):
+    index = indexBlocks(json)
+    blocks = index['Blocks']
+    tables = {}
+
+    for tableId in index['Types'].get('TABLE', []):
+        block = blocks[tableId]
+        pageId = findParent(index, tableId, 'PAGE')
+        if pageId is not None:
+            containingPage = blocks[pageId].get('Page', 1)
+        else:
+            containingPage = block.get('Page', 1)
+        tables[tableId] = {
+            'Type': "TABLE",
+            'BoundingBox': block['Geometry']['BoundingBox'],
+            'Polygon': block['Geometry']['Polygon'],
+            'ContainingPage': containingPage,
+            'Cells': {},
+            'Grid': [],
+            'NumRows': 0,
+            'NumColumns': 0
+        }
+        for rid in childIds(block):
+            tables[tableId]['Cells'][rid] = {}
+
+    for cellId in index['Types'].get('CELL', []):
+        block = blocks[cellId]
+        tableId = findParent(index, cellId, 'TABLE')
+        if tableId is None or tableId not in tables:
+            continue
+        tableblock = tables[tableId]
+        childblock = tableblock['Cells'][cellId]
+        childblock['Type'] = "CELL"
+        childblock['RowIndex'] = block['RowIndex']
+        childblock['ColumnIndex'] = block['ColumnIndex']
+        childblock['RowSpan'] = block['RowSpan']
+        childblock['ColumnSpan'] = block['ColumnSpan']
+        childblock['Confidence'] = block['Confidence']
+        childblock['BoundingBox'] = block['Geometry']['BoundingBox']
+        childblock['Polygon'] = block['Geometry']['Polygon']
+        childblock['WORD'] = []
+        for rid in childIds(block):
+            if rid in blocks and blocks[rid]['BlockType'] == "WORD":
+                childblock['WORD'].append({
+                    'Text': blocks[rid]['Text'],
+                    'BoundingBox': blocks[rid]['Geometry']['BoundingBox']
+                })
+        if childblock['RowIndex'] > tableblock['NumRows']:
+            tableblock['NumRows'] = childblock['RowIndex']
+        if childblock['ColumnIndex'] > tableblock['NumColumns']:
+            tableblock['NumColumns'] = childblock['ColumnIndex']
+
+    #Lay out the grid once all cells of each table are known
+    for tableblock in tables.values():
+        grid = [[None] * tableblock['NumColumns'] for i in range(tableblock['NumRows'])]
+        for childblock in tableblock['Cells'].values():
+            if 'WORD' in childblock:
+                grid[childblock['RowIndex'] - 1][childblock['ColumnIndex'] - 1] = ' '.join([word['Text'] for word in childblock['WORD']])
+        tableblock['Grid'] = grid
+
+    return tables
+
+#Extractor of the tables of the blocks dispatched to it, whose result is the same as extractTableBlocks on those blocks
+#Blocks may arrive in any order, tables are only assembled once all of them are visited
+#Table and cell blocks are kept whole until then, words only keep their text and bounding box
+#    cellWords: "relationships" (default) takes the words of each cell from its children, "geometry" assigns the words of
+#    the page to the cell covering most of their area, in reading order, for responses whose cells miss some of their words
+class TableExtractor(BlockExtractor):
+    blockTypes = ('PAGE', 'TABLE', 'CELL', 'WORD')
+
+    def __init__(self, cellWords="relationships"):
+        self.cellWords = cellWords
+        BlockExtractor.__init__(self)
+
+    def reset(self):
+        self.pageOf = {}
+        self.tables = []
+        self.tableOf = {}
+        self.cells = {}
+        self.words = {}
+
+    def visit(self, block):
+        blockType = block['BlockType']
+        if blockType == 'WORD':
+            self.words[block['Id']] = {'Text': block['Text'], 'BoundingBox': block['Geometry']['BoundingBox']}
+        elif blockType == 'CELL':
+            self.cells[block['Id']] = block
+        elif blockType == 'TABLE':
+            self.tables.append(block)
+            for rid in childIds(block):
+                self.tableOf.setdefault(rid, block['Id'])
+        else:
+            for rid in childIds(block):
+                self.pageOf.setdefault(rid, block.get('Page', 1))
+
+    #Assign the words of the page to the given cells by position, returns the words of each cell in reading order
+    def wordsByPosition(self, cellIds):
+        from textract_geometry import boxArray, assignBoxes, readingOrder
+        wordIds = list(self.words.keys())
+        words = boxArray([self.words[wordId]['BoundingBox'] for wordId in wordIds])
+        cells = boxArray([self.cells[cellId]['Geometry']['BoundingBox'] for cellId in cellIds])
+        assigned = assignBoxes(words, cells)
+        cellWords = dict((cellId, []) for cellId in cellIds)
+        for i in readingOrder(words):
+            if assigned[i] >= 0:
+                cellWords[cellIds[assigned[i]]].append(self.words[wordIds[i]])
+        return cellWords
+
+    def result(self):
+        tables = {}
+        for block in self.tables:
+            tables[block['Id']] = {
+                'Type': "TABLE",
+                'BoundingBox': block['Geometry']['BoundingBox'],
+                'Polygon': block['Geometry']['Polygon'],
+                'ContainingPage': self.pageOf.get(block['Id'], block.get('Page', 1)),
+                'Cells': {rid: {} for rid in childIds(block)},
+                'Grid': [],
+                'NumRows': 0,
+                'NumColumns': 0
+            }
+
+        cellWords = None
+        if self.cellWords == "geometry":
+            cellWords = self.wordsByPosition([cellId for cellId in self.cells.keys() if self.tableOf.get(cellId) in tables])
+
+        for cellId, block in self.cells.items():
+            tableId = self.tableOf.get(cellId)
+            if tableId is None or tableId not in tables:
+                continue
+            tableblock = tables[tableId]
+            childblock = tableblock['Cells'][cellId]
+            childblock['Type'] = "CELL"
+            childblock['RowIndex'] = block['RowIndex']
+            childblock['ColumnIndex'] = block['ColumnIndex']
+            childblock['RowSpan'] = block['RowSpan']
+            childblock['ColumnSpan'] = block['ColumnSpan']
+            childblock['Confidence'] = block['Confidence']
+            childblock['BoundingBox'] = block['Geometry']['BoundingBox']
+            childblock['Polygon'] = block['Geometry']['Polygon']
+            if cellWords is not None:
+                childblock['WORD'] = cellWords[cellId]
+            else:
+                childblock['WORD'] = [self.words[rid] for rid in childIds(block) if rid in self.words]
+            if childblock['RowIndex'] > tableblock['NumRows']:
+                tableblock['NumRows'] = childblock['RowIndex']
+            if childblock['ColumnIndex'] > tableblock['NumColumns']:
+                tableblock['NumColumns'] = childblock['ColumnIndex']
+
+        for tableblock in tables.values():
+            grid = [[None] * tableblock['NumColumns'] for i in range(tableblock['NumRows'])]
+            for childblock in tableblock['Cells'].values():
+                if 'WORD' in childblock:
+                    grid[childblock['RowIndex'] - 1][childblock['ColumnIndex'] - 1] = ' '.join([word['Text'] for word in childblock['WORD']])
+            tableblock['Grid'] = grid
+        return tables
+
+#Function to genrate table structure in XML, that can be rendered as HTML table
+def generateTableXML(tabledict):
+    from xml.etree.ElementTree import Element, SubElement
+    tables = []
+    num_tables = len(tabledict.keys())
+    for tkey in tabledict.keys():
+        containingPage = tabledict[tkey]['ContainingPage']
+        table = Element('table')
+        table.set('Id', tkey)
+        table.set('ContainingPage', str(containingPage))
+        table.set('border', "1")
+        NumRows = tabledict[tkey]['NumRows']
+        NumColumns = tabledict[tkey]['NumColumns']
+        Grid = tabledict[tkey]['Grid']
+        for i in range(NumRows):
+            row = SubElement(table, 'tr')
+            for j in range(NumColumns):
+                col = SubElement(row, 'td')
+                col.text = Grid[i][j]
+        while len(tables) < containingPage:
+            tables.append([])
+        table.set('TableNumber', str(len(tables[containingPage - 1]) + 1))
+        tables[containingPage - 1].append(table)
+    return num_tables, tables
+
+#ElementTree and minidom both write attributes sorted by name before Python 3.8, and in insertion order since
+SORTED_ATTRIBUTES = sys.version_info < (3, 8)
+
+#Function to escape text and attribute values the way minidom writes them
+def escapeXML(data):
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+#Function to number the tables of each page in the same order as generateTableXML, without building XML elements
+def numberTables(tabledict):
+    tables = []
+    for tkey in tabledict.keys():
+        containingPage = tabledict[tkey]['ContainingPage']
+        while len(tables) < containingPage:
+            tables.append([])
+        tables[containingPage - 1].append((tkey, len(tables[containingPage - 1]) + 1))
+    return len(tabledict.keys()), tables
+
+#Function to write a table as HTML straight from its grid, without building an XML tree
+#The indented form is byte for byte the output of prettify on the element from generateTableXML, the compact form
+#leaves out the XML declaration and all whitespace, and closes empty cells with an end tag as HTML expects
+def writeTableHTML(tableId, table, tableNumber, compact=False):
+    attributes = [('Id', tableId), ('ContainingPage', str(table['ContainingPage'])), ('border', "1"), ('TableNumber', str(tableNumber))]
+    if SORTED_ATTRIBUTES:
+        attributes.sort()
+    openTag = '<table' + ''.join([' {}="{}"'.format(name, escapeXML(value)) for name, value in attributes])
+    grid = table['Grid']
+
+    if compact:
+        parts = [openTag, '>']
+        for row in grid:
+            parts.append('<tr>')
+            for text in row:
+                parts.append('<td>' + escapeXML(text) + '</td>' if text else '<td></td>')
+            parts.append('</tr>')
+        parts.append('</table>')
+        return ''.join(parts)
+
+    parts = ['<?xml version="1.0" ?>\n']
+    if len(grid) == 0:
+        parts.append(openTag + '/>\n')
+        return ''.join(parts)
+    parts.append(openTag + '>\n')
+    for row in grid:
+        if len(row) == 0:
+            parts.append('  <tr/>\n')
+            continue
+        parts.append('  <tr>\n')
+        for text in row:
+            parts.append('    <td>' + escapeXML(text) + '</td>\n' if text else '    <td/>\n')
+        parts.append('  </tr>\n')
+    parts.append('</table>\n')
+    return ''.join(parts)
+
+#Function to build the structured representation of a table persisted next to its HTML, with rows, cells, spans and confidence
+def tableData(tableId, table, tableNumber):
+    cells = []
+    for cell in table['Cells'].values():
+        if 'RowIndex' not in cell:
+            continue
+        cellData = {
+            'RowIndex': cell['RowIndex'],
+            'ColumnIndex': cell['ColumnIndex'],
+            'RowSpan': cell['RowSpan'],
+            'ColumnSpan': cell['ColumnSpan'],
+            'Confidence': cell['Confidence'],
+            'BoundingBox': cell['BoundingBox']
+        }
+        if 'WORD' in cell:
+            cellData['Text'] = ' '.join([word['Text'] for word in cell['WORD']])
+        cells.append(cellData)
+    return {
+        'Id': tableId,
+        'ContainingPage': table['ContainingPage'],
+        'TableNumber': tableNumber,
+        'NumRows': table['NumRows'],
+        'NumColumns': table['NumColumns'],
+        'BoundingBox': table['BoundingBox'],
+        'Cells': cells
+    }
+
+#Function to lay out the grid of cell texts of a structured table, as extractTableBlocks does
+def tableGrid(data):
+    grid = [[None] * data['NumColumns'] for i in range(data['NumRows'])]
+    for cell in data['Cells']:
+        if 'Text' in cell:
+            grid[cell['RowIndex'] - 1][cell['ColumnIndex'] - 1] = cell['Text']
+    return grid
+
+#Function to render a structured table as HTML, only when HTML is asked for
+def tableDataToHTML(data, compact=False):
+    return writeTableHTML(data['Id'], {'ContainingPage': data['ContainingPage'], 'Grid': tableGrid(data)}, data['TableNumber'], compact)
+
+#Function to convert a structured table to the same dictionary etree_to_dict returns for its HTML, without parsing it
+def tableDataToDict(data):
+    rows = []
+    for row in tableGrid(data):
+        cells = [text.strip() if text else None for text in row]
+        if len(cells) == 0:
+            rows.append(None)
+        else:
+            rows.append({'td': cells[0] if len(cells) == 1 else cells})
+    table = {}
+    if len(rows) > 0:
+        table['tr'] = rows[0] if len(rows) == 1 else rows
+    attributes = [('Id', data['Id']), ('ContainingPage', str(data['ContainingPage'])), ('border', "1"), ('TableNumber', str(data['TableNumber']))]
+    if SORTED_ATTRIBUTES:
+        attributes.sort()
+    for name, value in attributes:
+        table['@' + name] = value
+    return {'table': table}
+
+#Convert XML Tables to JSON    
+def etree_to_dict(t):
+    d = {t.tag: {} if t.attrib else None}
+    children = list(t)
+    if children:
+        dd = defaultdict(list)
+        for dc in map(etree_to_dict, children):
+            for k, v in dc.items():
+                dd[k].append(v)
+        d = {t.tag: {k: v[0] if len(v) == 1 else v
+                     for k, v in dd.items()}}
+    if t.attrib:
+        d[t.tag].update(('@' + k, v)
+                        for k, v in t.attrib.items())
+    if t.text:
+        text = t.text.strip()
+        if children or t.attrib:
+            if text:
+              d[t.tag]['#text'] = text
+        else:
+            d[t.tag] = text
+    return d
+
+#Function to parse a table written as HTML back to a dictionary, for table files written before structured table data
+def parseTableHTML(body):
+    from xml.etree import ElementTree
+    return etree_to_dict(ElementTree.fromstring(body))
+
+#Function to prettify XML    
+def prettify(elem):
+    from xml.dom import minidom
+    from xml.etree import ElementTree
+    rough_string = ElementTree.tostring(elem, 'utf-8')
+    reparsed = minidom.parseString(rough_string)
+    return reparsed.toprettyxml(indent="  ")
+
+#Writer bundling the tables of a job into a few objects, one per job or per range of pages, along with an offset index
+#The index lists, for every table, the bundle holding it and its byte range, so that a single table can be read with a
+#ranged GET, as in Range="bytes={Offset}-{Offset+Length-1}"
+class TableBundleWriter(object):
+
+    def __init__(self, sink, upload_prefix, document_name, bundlePages=0):
+        self.sink = sink
+        self.upload_prefix = upload_prefix
+        self.document_name = document_name
+        self.bundlePages = bundlePages
+        self.bundles = []
+        self.tables = []
+        self.bundleBuffer = None
+        self.firstPage = None
+        self.lastPage = None
+
+    def add(self, pageNumber, tableNumber, tableId, html):
+        if self.bundleBuffer is not None and self.bundlePages > 0 and pageNumber >= self.firstPage + self.bundlePages:
+            self._flush()
+        if self.bundleBuffer is None:
+            self.bundleBuffer = io.BytesIO()
+            self.firstPage = pageNumber
+        data = html.encode('utf-8')
+        self.tables.append({'Bundle': len(self.bundles), 'Page': pageNumber, 'TableNumber': int(tableNumber), 'Id': tableId,
+                            'Offset': self.bundleBuffer.tell(), 'Length': len(data)})
+        self.bundleBuffer.write(data)
+        self.lastPage = pageNumber
+
+    def _flush(self):
+        if self.bundlePages > 0:
+            bundle_document = "{}-tables-pages-{}-{}.bundle".format(self.document_name, self.firstPage, self.lastPage)
+        else:
+            bundle_document = "{}-tables.bundle".format(self.document_name)
+        self.bundles.append(self.sink.write("{}/{}".format(self.upload_prefix, bundle_document), self.bundleBuffer.getvalue()))
+        self.bundleBuffer = None
+
+    #Write the last bundle and the index, returns the key of the index
+    def close(self):
+        if self.bundleBuffer is not None:
+            self._flush()
+        index_document = "{}-tables-index.json".format(self.document_name)
+        self.sink.write("{}/{}".format(self.upload_prefix, index_document), json.dumps({'Bundles': self.bundles, 'Tables': self.tables}))
+        print("{} tables written to {} bundles".format(len(self.tables), len(self.bundles)))
+        return "{}/{}".format(self.upload_prefix, index_document)
@@ -0,0 +1,43 @@
+from textract_blocks import childIds, BlockExtractor
+
+#Extractor of the lines of text of the blocks dispatched to it, keeping the text of each line and the lines of each page
+class PageTextExtractor(BlockExtractor):
+    blockTypes = ('PAGE', 'LINE')
+
+    def reset(self):
+        self.lines = {}
+        self.pages = []
+
+    def visit(self, block):
+        if block['BlockType'] == 'LINE':
+            self.lines[block['Id']] = block['Text']
+        else:
+            self.pages.append((block.get('Page', 1), childIds(block)))
+
+    #Stream the lines of text one page at a time in page order, as (page key, page text) pairs
+    def result(self):
+        for pageNumber, line_ids in sorted(self.pages, key=lambda page: page[0]):
+            page_text = {}
+            for line_id in line_ids:
+                if line_id in self.lines:
+                    page_text['Line-{0:04d}'.format(len(page_text)+1)] = {'Text': self.lines[line_id]}
+            print("Page-{} contains {} Lines".format(pageNumber, len(page_text)))
+            yield 'Page-{0:02d}'.format(pageNumber), page_text
+
+#Function to stream lines of text out of textract response, one page at a time in page order
+def iterPageText(blocks):
+    extractor = PageTextExtractor()
+    for blockType in ['LINE', 'PAGE']:
+        for block in blocks.get(blockType, []):
+            extractor.visit(block)
+    return extractor.result()
+
+#Function to extract lines of text from all pages from textract response
+def extractTextBody(blocks):
+    total_line = 0
+    document_text = {}
+    for page_key, page_text in iterPageText(blocks):
+        document_text[page_key] = page_text
+        total_line += len(page_text)
+    print(total_line)
+    return document_text, total_line